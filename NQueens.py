@@ -1,4 +1,165 @@
-import pygame
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # Spawned workers re-import this module
+import pygame, time
+import numpy as np
+from functools import partial
+from multiprocessing import get_context
+
+def count_solutions(n: int, cols: int = 0, ld: int = 0, rd: int = 0, batch: int = 1 << 14) -> int:
+    '''
+    Counts the completions of a partial board given as its column and diagonal attack masks for the next row.
+    Partial boards are held as mask arrays and a row is placed for a whole batch of them at once. Batches are
+    expanded depth-first, so at most one expanded batch per row is alive and memory stays O(n^2 * batch)
+    '''
+    full: int = (1 << n) - 1
+    dtype: type = np.int32 if n <= 30 else np.int64
+    start: int = cols.bit_count()
+    if start == n: return 1
+    total: int = 0
+    # (row, cols, ld, rd) batches still to expand
+    stack: list[tuple] = [(start, *(np.array([mask], dtype) for mask in (cols, ld, rd)))]
+    while stack:
+        row, c, l, r = stack.pop()
+        avail: np.ndarray = full & ~(c | l | r)
+        if row == n - 1:
+            total += int(np.count_nonzero(avail))
+            continue
+        nc, nl, nr = [], [], []
+        while len(keep := np.flatnonzero(avail)):
+            avail, c, l, r = avail[keep], c[keep], l[keep], r[keep]
+            bit: np.ndarray = avail & -avail
+            avail ^= bit
+            nc.append(c | bit)
+            nl.append(((l | bit) << 1) & full)
+            nr.append((r | bit) >> 1)
+        if not nc: continue
+        c, l, r = np.concatenate(nc), np.concatenate(nl), np.concatenate(nr)
+        for i in range(0, len(c), batch):
+            stack.append((row + 1, c[i:i+batch], l[i:i+batch], r[i:i+batch]))
+    return total
+
+def split_work(n: int, depth: int = 2) -> list[tuple[int]]:
+    '''
+    Partial boards with the first depth (1 or 2) queens placed as (weight, cols, ld, rd).
+    A board and its left-right mirror have the same number of solutions, so only first queens in the left half
+    are kept with weight 2. With an odd n the middle column is kept once, and its second queens are halved the same way
+    '''
+    full: int = (1 << n) - 1
+    parts: list[tuple[int]] = []
+    for c in range(n - n//2):
+        weight: int = 2 if c < n//2 else 1
+        bit: int = 1 << c
+        cols, ld, rd = bit, (bit << 1) & full, bit >> 1
+        if depth < 2 or n < 2:
+            parts.append((weight, cols, ld, rd))
+            continue
+        avail: int = full & ~(cols | ld | rd)
+        while avail:
+            bit = avail & -avail
+            avail ^= bit
+            # Behind a middle queen only the left half of the second row is kept, doubled
+            if weight == 1 and bit > 1 << (n//2): continue
+            parts.append((2, cols | bit, ((ld | bit) << 1) & full, (rd | bit) >> 1))
+    return parts
+
+def count_part(n: int, part: tuple[int]) -> int:
+    weight, cols, ld, rd = part
+    return weight * count_solutions(n, cols, ld, rd)
+
+def count_parallel(n: int, workers: int = 0, depth: int = 2, progress: bool = True) -> int:
+    '''Counts every solution on a process pool, one task per partial board from split_work'''
+    parts: list[tuple[int]] = split_work(n, depth)
+    total: int = 0
+    start: float = time.perf_counter()
+    # Spawned rather than forked, forking the running pygame App can deadlock the workers
+    with get_context("spawn").Pool(workers or os.cpu_count()) as pool:
+        for done, count in enumerate(pool.imap_unordered(partial(count_part, n), parts), 1):
+            total += count
+            if progress:
+                elapsed: float = time.perf_counter() - start
+                print(f"\r{done}/{len(parts)} parts, {total} solutions, {total / elapsed:.0f} solutions/s", end="")
+    if progress: print(f"\n{total} solutions for n = {n} in {time.perf_counter() - start:.2f}s")
+    return total
+
+def benchmark_parallel(n: int = 15, max_workers: int = 0, depth: int = 2) -> None:
+    '''Prints the counting time against worker count'''
+    print(f"n = {n}, {len(split_work(n, depth))} parts")
+    base: float = 0
+    workers: int = 1
+    while workers <= (max_workers or os.cpu_count()):
+        start: float = time.perf_counter()
+        total: int = count_parallel(n, workers, depth, False)
+        elapsed: float = time.perf_counter() - start
+        base = base or elapsed
+        print(f"{workers} workers: {elapsed:.2f}s ({base / elapsed:.2f}x), {total} solutions")
+        workers *= 2
+
+class NQueens_Bitmask:
+    '''
+    Backtracking on three bitmasks: the columns taken and the squares attacked along both diagonals
+    in the next row. The left diagonals shift one column up and the right ones one column down per row.
+    Keeps searching after a solution so every solution is counted.
+    '''
+    def __init__(self, n: int) -> None:
+        self.n: int = n
+        self.full: int = (1 << n) - 1
+        self.reset()
+
+    def reset(self) -> None:
+        # One (cols, ld, rd, untried columns) frame per row reached
+        self.stack: list[list[int]] = [[0, 0, 0, self.full]]
+        self.queens: list[int] = []
+        self.queens_len: int = 0
+        self.solutions: int = 0
+        self.done: bool = False
+
+    def place(self, col: int) -> None:
+        frame: list[int] = self.stack[-1]
+        bit: int = 1 << col
+        frame[3] &= ~bit
+        cols, ld, rd = frame[0] | bit, ((frame[1] | bit) << 1) & self.full, (frame[2] | bit) >> 1
+        self.stack.append([cols, ld, rd, self.full & ~(cols | ld | rd)])
+        self.queens.append(col)
+        self.queens_len += 1
+
+    def backtrack(self) -> None:
+        self.stack.pop()
+        self.queens.pop()
+        self.queens_len -= 1
+
+    def get_not_possible(self, row: int) -> list[int]:
+        if row < self.queens_len: return list(range(self.n))
+        cols, ld, rd, _ = self.stack[-1]
+        shift: int = row - self.queens_len
+        mask: int = (cols | (ld << shift) | (rd >> shift)) & self.full
+        return [i for i in range(self.n) if mask >> i & 1]
+
+    def next(self) -> None:
+        if self.queens_len == self.n:
+            self.backtrack()
+            return
+        avail: int = self.stack[-1][3]
+        if not avail:
+            if self.queens_len == 0:
+                self.done = True
+                return
+            self.backtrack()
+            return
+        self.place((avail & -avail).bit_length() - 1)
+
+    def update(self) -> bool:
+        if self.done: return False
+        self.next()
+        if self.queens_len == self.n:
+            self.solutions += 1
+            print(f"Solution {self.solutions}: " + str(self.queens))
+            return True
+        if self.done: print(f"All {self.solutions} solutions found for n = {self.n}")
+        return False
+
+    def count(self) -> int:
+        '''Counts every solution, one sweep per first queen in the left half to keep the arrays small'''
+        return sum(count_part(self.n, part) for part in split_work(self.n, 1))
 
 class NQueens_BitManip:
     def __init__(self, n: int) -> None:
@@ -66,13 +227,16 @@ class NQueens_BitManip:
         return False
 
 class NQueens:
+    '''
+    board counts the placed queens attacking every square. Backtracking subtracts the last queen's lines
+    again, so placing and removing a queen costs O(n) and the board is never copied.
+    '''
     def __init__(self, n: int) -> None:
         self.n: int = n
         self.reset()
     
     def reset(self) -> None:
         self.board: list[list[int]] = [[0 for _ in range(self.n)] for _ in range(self.n)]
-        self.history: list[list[list[int]]] = []
         self.queens: list[int] = []
         self.queens_len: int = len(self.queens)
         self.start: int = 0
@@ -88,12 +252,21 @@ class NQueens:
     def place(self, row: int, col: int) -> None:
         if self.board[row][col]: return
         self.queens.append(col)
-        self.history.append([i[:] for i in self.board])
         self.queens_len += 1
-        
+        self.mark(row, col, 1)
+
+    def remove(self) -> int:
+        '''Takes back the last queen and returns its column'''
+        col: int = self.queens.pop()
+        self.queens_len -= 1
+        self.mark(self.queens_len, col, -1)
+        return col
+
+    def mark(self, row: int, col: int, delta: int) -> None:
+        '''Adds delta to every square attacked by a queen at (row, col)'''
         for i in range(self.n):
-            self.board[row][i] = 1 # Horizontal
-            self.board[i][col] = 1 # Vertical
+            self.board[row][i] += delta # Horizontal
+            self.board[i][col] += delta # Vertical
         
         # Major Diagonal
         diag: int = min(row, col)
@@ -101,7 +274,7 @@ class NQueens:
         diag_col: int = col - diag
         for i in range(self.n):
             if diag_row >= self.n or diag_col >= self.n: break
-            self.board[diag_row][diag_col] = 1
+            self.board[diag_row][diag_col] += delta
             diag_row += 1
             diag_col += 1
         
@@ -111,7 +284,7 @@ class NQueens:
         diag_col = col + diag
         for i in range(self.n):
             if diag_row >= self.n or diag_col < 0: break
-            self.board[diag_row][diag_col] = 1
+            self.board[diag_row][diag_col] += delta
             diag_row += 1
             diag_col -= 1
     
@@ -124,9 +297,7 @@ class NQueens:
     def next(self) -> None:
         possible: list[int] = self.get_possible(self.queens_len, self.start)
         if (not possible):
-            self.board = self.history.pop()
-            self.start = self.queens.pop() + 1
-            self.queens_len -= 1
+            self.start = self.remove() + 1
             return
         self.place(self.queens_len, possible[0])
         self.start = 0
@@ -135,14 +306,18 @@ class App:
     n: int = 8
     cell_size: int = 50
     surf_size: int = n*cell_size
+    ENGINES: list[type] = [NQueens, NQueens_BitManip, NQueens_Bitmask]
     def __init__(self, WIN: pygame.Surface) -> None:
         print("Starting the N-Queens Visualisation")
+        print("E to switch the solver, the bitmask solver keeps going through every solution")
+        print("C to count every solution for this n")
+        print("P to count every solution for this n on a process pool")
         
         # self.vis: NQueens | NQueens_BitManip = NQueens_BitManip(self.n)
         self.vis: NQueens | NQueens_BitManip = NQueens(App.n)
 
         self.WIN: pygame.Surface = WIN
-        pygame.display.set_caption("N-Queens Visualisation")
+        self.set_caption()
 
         self.img: pygame.Surface = pygame.image.load("assets\\W_Queen.png")
         self.img.set_colorkey((181, 230, 29))
@@ -164,6 +339,19 @@ class App:
         self.timer: int = 0
         self.time: int = 500
     
+    def set_caption(self) -> None:
+        pygame.display.set_caption(f"N-Queens Visualisation ({type(self.vis).__name__})")
+
+    def switch_engine(self) -> None:
+        engine: type = App.ENGINES[(App.ENGINES.index(type(self.vis)) + 1) % len(App.ENGINES)]
+        self.vis = engine(App.n)
+        self.set_caption()
+
+    def count_all(self) -> None:
+        start: float = time.perf_counter()
+        count: int = NQueens_Bitmask(App.n).count()
+        print(f"{count} solutions for n = {App.n}, counted in {time.perf_counter() - start:.3f}s")
+
     def draw_queens(self) -> None:
         for row, col in enumerate(self.vis.queens):
             self.surf.blit(self.img, (col*App.cell_size, row*App.cell_size))
@@ -196,6 +384,13 @@ class App:
         end = time()
         print(f"Normal took: {end - start}")
 
+        vis_mask: NQueens_Bitmask = NQueens_Bitmask(App.n)
+        start = time()
+        while not vis_mask.update():
+            pass
+        end = time()
+        print(f"Bitmask took: {end - start}")
+
     def mainloop(self) -> bool:
         while True:
             for event in pygame.event.get():
@@ -207,6 +402,12 @@ class App:
                         match event.key:
                             case pygame.K_ESCAPE:
                                 return True
+                            case pygame.K_e:
+                                self.switch_engine()
+                            case pygame.K_c:
+                                self.count_all()
+                            case pygame.K_p:
+                                count_parallel(App.n)
                     
                     case pygame.MOUSEBUTTONDOWN:
                         match event.button:
@@ -225,7 +426,13 @@ class App:
         pygame.display.set_caption("Visualisation")
 
 if __name__ == "__main__":
-    WIN: pygame.Surface = pygame.display.set_mode((App.surf_size, App.surf_size))
-    app: App = App(WIN)
-    app.mainloop()
-    pygame.quit()
\ No newline at end of file
+    import sys
+    if "--count" in sys.argv:
+        count_parallel(*map(int, sys.argv[sys.argv.index("--count")+1:]))
+    elif "--bench-count" in sys.argv:
+        benchmark_parallel(*map(int, sys.argv[sys.argv.index("--bench-count")+1:]))
+    else:
+        WIN: pygame.Surface = pygame.display.set_mode((App.surf_size, App.surf_size))
+        app: App = App(WIN)
+        app.mainloop()
+        pygame.quit()
\ No newline at end of file
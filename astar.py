@@ -1,115 +1,566 @@
 '''
-A* Path Finding Algorithm for 2D Grid without diagonal movement
+A* Path Finding Algorithm for 2D Grid, 4-connected or 8-connected without corner cutting,
+with an optional Jump Point Search mode for the 4-connected grid
 '''
-import pygame
+import pygame, heapq, math, random, time
+from array import array
+from itertools import count
 from utils import drawGridLines
 
-class Node:
-    def __init__(self, row: int, col: int, parent, goal: list[int]) -> None:
-        self.row: int = row
-        self.col: int = col
-        self.parent: Node = parent
-        self.g: int = 0 if self.parent is None else self.parent.g + 1
-        self.h: int = self.getDist(goal)
-        self.f: int = self.g + self.h
-    
-    def update(self, parent) -> None:
-        newG: int = parent.g + 1
-        if newG >= self.g: return
-        self.parent = parent
-        self.g: int = newG
-        self.f: int = self.h + self.g
-
-    def getDist(self, pt: list[int]) -> int:
-        return abs(self.row - pt[0]) + abs(self.col - pt[1])
-    
-    def getDistFromNode(self, other) -> int:
-        return self.getDist([other.row, other.col])
-
-    def isSame(self, other) -> bool:
-        if isinstance(other, Node): return (self.row == other.row and self.col == other.col)
-        return (self.row == other[0] and self.col == other[1])
-
-    def __repr__(self) -> str:
-        return f"({self.row}, {self.col}) : ({self.g}, {self.h}, {self.f})"
-
 class Astar:
+    '''
+    Search state lives in flat arrays indexed by cell id (row*cols + col): g-score, parent id,
+    open/closed state and the id of the search that last touched the cell, so starting a new
+    search never has to clear them.
+    '''
     states: dict[str: int] = {"wall": 0, "empty": 1, "start": 2, "goal": 3}
-    def __init__(self) -> None:
+    NEW, OPEN, CLOSED = 0, 1, 2
+    MODES: list[str] = ["A*", "JPS"]
+    # How cells with equal f leave the open set: insertion order, deeper cells first,
+    # closest to the straight start-goal line first, or lowest cell id first
+    TIEBREAKS: list[str] = ["FIFO", "high g", "cross", "cell id"]
+    def __init__(self, rows: int = 0, cols: int = 0, view = None, mode: str = "A*", tieBreak: str = "FIFO", diagonal: bool = False) -> None:
+        '''view is the App drawing the search, None to search headless. JPS only runs on the 4-connected grid'''
+        self.rows: int = rows or App.ROWS
+        self.cols: int = cols or App.COLS
+        self.view: App = view
+        size: int = self.rows * self.cols
+        self.g: array = array("i", bytes(4 * size))
+        self.parent: array = array("i", bytes(4 * size))
+        self.state: bytearray = bytearray(size)
+        self.stamp: array = array("I", bytes(4 * size))
+        self.searchId: int = 0
+        self.mode: str = mode
+        self.tieBreak: str = tieBreak
+        self.diagonal: bool = diagonal
         self.reset()
 
     def reset(self) -> None:
-        self.solveStarted: bool = False
-        self.current: Node = None
-        self.open: list = []
-        self.closed: list = []
-        self.path: list = []
+        self.resetSearch()
         self.resetGrid()
-        App.instance.resetSurf()
+        if self.view is not None: self.view.resetSurf()
+
+    def resetSearch(self) -> None:
+        self.solveStarted: bool = False
+        self.current: int = -1
+        # Binary heap of (f, tie-break key, cell id), entries whose cell got a better g are skipped when popped
+        self.open: list[tuple[float]] = []
+        self.order = count()
+        self.path: list[tuple[int]] = []
+        self.expanded: int = 0
+        self.elapsed: float = 0
+        self.searchId += 1
 
     def resetGrid(self) -> None:
-        self.grid: list[list[int]] = [[1 for j in range(App.COLS)] for i in range(App.ROWS)]
+        self.grid: bytearray = bytearray(b"\x01") * (self.rows * self.cols)
         self.endPoints: list[list[int]] = [[-1, -1], [-1, -1]]
+        self.planner: LPAstar = None
+        self.hierarchy: HPAstar = None
+
+    def updateGrid(self, row: int, col: int, clr: tuple[int]) -> None:
+        if self.view is not None: self.view.updateGrid(row, col, clr)
     
     def place(self, pos: tuple[int], state: int) -> None:
-        if pos[0] < 0 or pos[0] >= App.ROWS or pos[1] < 0 or pos[1] >= App.COLS: return
-        self.grid[pos[0]][pos[1]] = state
-        if state in [self.states["start"], self.states["goal"]]: self.endPoints[state-2] = pos[:]
-        App.instance.updateGrid(*pos, App.COLORSLIST[state])
+        if pos[0] < 0 or pos[0] >= self.rows or pos[1] < 0 or pos[1] >= self.cols: return
+        i: int = pos[0]*self.cols + pos[1]
+        changed: bool = (not self.grid[i]) != (not state)
+        self.grid[i] = state
+        if changed and self.hierarchy is not None: self.hierarchy.update(i)
+        if state in [self.states["start"], self.states["goal"]]:
+            self.endPoints[state-2] = pos[:]
+            if self.planner is not None: self.planner.reset()
+        elif changed and self.planner is not None:
+            self.planner.update(i)
+        self.updateGrid(*pos, App.COLORSLIST[state])
+
+    def plan(self) -> None:
+        '''Switches to incremental planning, later edits through place only repair the search'''
+        self.resetSearch()
+        self.planner = LPAstar(self)
+        self.replan()
+
+    def replan(self) -> None:
+        old: list[tuple[int]] = self.path
+        self.path = self.planner.solve()
+        if self.view is None: return
+        for r, c in old:
+            if self.grid[r*self.cols + c] == self.states["empty"]: self.updateGrid(r, c, App.COLORS["empty"])
+        for r, c in self.path:
+            self.updateGrid(r, c, App.COLORS["goal"])
+
+    def getState(self, i: int) -> int:
+        return self.state[i] if self.stamp[i] == self.searchId else Astar.NEW
+
+    def getDist(self, i: int, j: int) -> int:
+        r1, c1 = divmod(i, self.cols)
+        r2, c2 = divmod(j, self.cols)
+        return abs(r1 - r2) + abs(c1 - c2)
     
-    def getNeighbors(self) -> list[list[int]]:
-        n: list[list[int]] = []
-        r: int = self.current.row
-        c: int = self.current.col
-        for i in [[r-1, c], [r+1, c], [r, c-1], [r, c+1]]:
-            if 0 <= i[0] < App.ROWS and 0 <= i[1] < App.COLS and self.grid[i[0]][i[1]]:
-                n.append(i)
-        return n[:]
+    def getHeuristic(self, i: int) -> float:
+        r1, c1 = divmod(i, self.cols)
+        r2, c2 = divmod(self.goal, self.cols)
+        dr, dc = abs(r1 - r2), abs(c1 - c2)
+        if not self.diagonal: return dr + dc
+        # Octile distance
+        return max(dr, dc) + (math.sqrt(2) - 1) * min(dr, dc)
+
+    def getF(self, i: int) -> float:
+        f: float = self.g[i] + self.getHeuristic(i)
+        if self.tieBreak == "cross":
+            # Nudge by the cross product with the start-goal line, scaled to stay below 0.001
+            r1, c1 = divmod(i, self.cols)
+            r2, c2 = divmod(self.goal, self.cols)
+            r3, c3 = divmod(self.start, self.cols)
+            f += abs((r1 - r2)*(c3 - c2) - (r3 - r2)*(c1 - c2)) / (1000 * (self.rows + self.cols) ** 2)
+        return f
+
+    def getNeighbors(self, i: int) -> list[int]:
+        r, c = divmod(i, self.cols)
+        n: list[int] = []
+        if r > 0 and self.grid[i - self.cols]: n.append(i - self.cols)
+        if r < self.rows - 1 and self.grid[i + self.cols]: n.append(i + self.cols)
+        if c > 0 and self.grid[i - 1]: n.append(i - 1)
+        if c < self.cols - 1 and self.grid[i + 1]: n.append(i + 1)
+        return n
+
+    def jump(self, i: int, dr: int, dc: int) -> int:
+        '''
+        Walks from i in direction (dr, dc) and returns the first jump point, -1 on hitting a wall.
+        Horizontal scans stop beside a wall corner (a forced vertical turn), vertical scans stop where
+        a horizontal scan from the cell finds a jump point
+        '''
+        grid, cols = self.grid, self.cols
+        r, c = divmod(i, cols)
+        while True:
+            r += dr
+            c += dc
+            if r < 0 or r >= self.rows or c < 0 or c >= cols: return -1
+            i = r*cols + c
+            if not grid[i]: return -1
+            if i == self.goal: return i
+            if dc:
+                if r > 0 and grid[i - cols] and not grid[i - cols - dc]: return i
+                if r < self.rows - 1 and grid[i + cols] and not grid[i + cols - dc]: return i
+            elif self.jump(i, 0, -1) >= 0 or self.jump(i, 0, 1) >= 0:
+                return i
+
+    def getJumpPoints(self, i: int) -> list[tuple[int]]:
+        '''Successors of i under JPS as (cell id, distance) pairs'''
+        p: int = self.parent[i]
+        if p < 0:
+            dirs: list[tuple[int]] = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        else:
+            r, c = divmod(i, self.cols)
+            pr, pc = divmod(p, self.cols)
+            dr, dc = (r > pr) - (r < pr), (c > pc) - (c < pc)
+            if dr:
+                dirs = [(dr, 0), (0, -1), (0, 1)]
+            else:
+                dirs = [(0, dc)]
+                if r > 0 and self.grid[i - self.cols] and not self.grid[i - self.cols - dc]: dirs.append((-1, 0))
+                if r < self.rows - 1 and self.grid[i + self.cols] and not self.grid[i + self.cols - dc]: dirs.append((1, 0))
+        jumps: list[tuple[int]] = []
+        for dr, dc in dirs:
+            j: int = self.jump(i, dr, dc)
+            if j >= 0: jumps.append((j, self.getDist(i, j)))
+        return jumps
+
+    def getDiagonals(self, i: int) -> list[int]:
+        '''Diagonal neighbours of i whose two shared orthogonal neighbours are both free, so no corner is cut'''
+        r, c = divmod(i, self.cols)
+        n: list[int] = []
+        for dr in (-1, 1):
+            if r + dr < 0 or r + dr >= self.rows or not self.grid[i + dr*self.cols]: continue
+            for dc in (-1, 1):
+                if 0 <= c + dc < self.cols and self.grid[i + dc] and self.grid[i + dr*self.cols + dc]:
+                    n.append(i + dr*self.cols + dc)
+        return n
+
+    def getSuccessors(self, i: int) -> list[tuple[float]]:
+        if self.diagonal: return [(n, 1) for n in self.getNeighbors(i)] + [(n, math.sqrt(2)) for n in self.getDiagonals(i)]
+        if self.mode == "JPS": return self.getJumpPoints(i)
+        return [(n, 1) for n in self.getNeighbors(i)]
+
+    def pushOpen(self, i: int, g: float, parent: int) -> None:
+        self.stamp[i] = self.searchId
+        self.state[i] = Astar.OPEN
+        self.g[i] = g
+        self.parent[i] = parent
+        match self.tieBreak:
+            case "high g": key = (-g, next(self.order))
+            case "cell id": key = i
+            case _: key = next(self.order)
+        heapq.heappush(self.open, (self.getF(i), key, i))
 
     def solveStart(self) -> None:
-        self.open.append(Node(*self.endPoints[0], None, self.endPoints[1]))
+        # Octile costs need doubles, 4-connected searches keep 4 byte g-scores
+        typecode: str = "d" if self.diagonal else "i"
+        if self.g.typecode != typecode: self.g = array(typecode, bytes(array(typecode).itemsize * self.rows * self.cols))
+        self.start: int = self.endPoints[0][0]*self.cols + self.endPoints[0][1]
+        self.goal: int = self.endPoints[1][0]*self.cols + self.endPoints[1][1]
+        self.pushOpen(self.start, 0, -1)
         self.solveStarted: bool = True
+        self.startTime: float = time.perf_counter()
 
     def solveNext(self) -> None:
-        self.current: Node = self.getFromOpen()
-        self.closed.append(self.current)
-        if (not self.current.isSame(self.endPoints[0])) and (not self.current.isSame(self.endPoints[1])):
-            App.instance.updateGrid(self.current.row, self.current.col, App.COLORS["closed"])
+        self.current = self.getFromOpen()
+        if self.current < 0:
+            if self.view is not None: print("No path found")
+            self.finish()
+            return
+        cur: int = self.current
+        self.state[cur] = Astar.CLOSED
+        self.expanded += 1
+        if cur != self.start and cur != self.goal:
+            self.updateGrid(*divmod(cur, self.cols), App.COLORS["closed"])
 
-        if self.current.isSame(self.endPoints[1]):
+        if cur == self.goal:
             self.getPath()
-            self.solveStarted = False
+            self.finish()
             return
-        
-        for n in self.getNeighbors():
-            if self.inLst(self.closed, n) >= 0: continue
-            
-            openIdx = self.inLst(self.open, n)
-            if openIdx < 0:
-                self.open.append(Node(n[0], n[1], self.current, self.endPoints[1]))
-                App.instance.updateGrid(*n, App.COLORS["open"])
-            self.open[openIdx].update(self.current)
+
+        for n, cost in self.getSuccessors(cur):
+            g: float = self.g[cur] + cost
+            state: int = self.getState(n)
+            if state == Astar.NEW:
+                self.pushOpen(n, g, cur)
+                self.updateGrid(*divmod(n, self.cols), App.COLORS["open"])
+            elif state == Astar.OPEN and self.g[n] > g:
+                self.pushOpen(n, g, cur)
+
+    def finish(self) -> None:
+        self.solveStarted = False
+        self.elapsed = time.perf_counter() - self.startTime
+        if self.view is not None: print(f"{self.getName()}: expanded {self.expanded} nodes, path of {len(self.path)} cells")
+
+    def getName(self) -> str:
+        return f"{'A*' if self.diagonal else self.mode} {8 if self.diagonal else 4}-connected, {self.tieBreak} ties"
+
+    def solve(self, start: list[int] = None, goal: list[int] = None) -> list[tuple[int]]:
+        '''Runs the whole search at once and returns the path from the goal back to the start'''
+        if start is not None: self.endPoints[0] = list(start)
+        if goal is not None: self.endPoints[1] = list(goal)
+        self.resetSearch()
+        self.solveStart()
+        while self.solveStarted:
+            self.solveNext()
+        return self.path
 
     def getPath(self) -> None:
-        self.path: list[Node] = [self.current]
-        parent: Node = self.current.parent
-        while parent is not None:
-            self.path.append(parent)
-            parent = parent.parent
-        for i in App.instance.astar.path:
-            App.instance.updateGrid(i.row, i.col, App.COLORS["goal"])
-        drawGridLines(App.instance.surf, App.ROWS, App.COLS, App.SIDE, App.COLORS["wall"], True)
-
-    def inLst(self, lst, node) -> int:
-        for i, n in enumerate(lst):
-            if n.isSame(node): return i
+        self.path: list[tuple[int]] = []
+        i: int = self.current
+        while i >= 0:
+            p: int = self.parent[i]
+            if p < 0:
+                self.path.append(divmod(i, self.cols))
+                break
+            # Jump point parents are a straight run away, fill in the cells between
+            r, c = divmod(i, self.cols)
+            pr, pc = divmod(p, self.cols)
+            step: int = ((pr > r) - (pr < r)) * self.cols + (pc > c) - (pc < c)
+            while i != p:
+                self.path.append(divmod(i, self.cols))
+                i += step
+        if self.view is None: return
+        for r, c in self.path:
+            self.updateGrid(r, c, App.COLORS["goal"])
+        drawGridLines(self.view.surf, self.rows, self.cols, App.SIDE, App.COLORS["wall"])
+        self.view.update()
+
+    def getFromOpen(self) -> int:
+        while self.open:
+            f, _, i = heapq.heappop(self.open)
+            if self.state[i] == Astar.CLOSED or f != self.getF(i): continue
+            return i
         return -1
 
-    def getFromOpen(self) -> Node:
-        idx: int = 0
-        for i, n in enumerate(self.open):
-            if i == idx or n.f < self.open[idx].f: idx = i
-        return self.open.pop(idx)
+class LPAstar:
+    '''
+    Lifelong Planning A* over the grid of an Astar. g and rhs (the best g through a neighbour) are kept
+    between searches, so after a cell changes only the cells whose g it affects are expanded again.
+    '''
+    INF: int = 1 << 30
+    def __init__(self, astar: Astar) -> None:
+        self.astar: Astar = astar
+        self.reset()
+
+    def reset(self) -> None:
+        astar: Astar = self.astar
+        self.start: int = astar.endPoints[0][0]*astar.cols + astar.endPoints[0][1]
+        self.goal: int = astar.endPoints[1][0]*astar.cols + astar.endPoints[1][1]
+        size: int = astar.rows * astar.cols
+        self.g: array = array("i", [LPAstar.INF]) * size
+        self.rhs: array = array("i", [LPAstar.INF]) * size
+        self.inOpen: bytearray = bytearray(size)
+        self.open: list[tuple[int]] = []
+        self.expanded: int = 0
+        self.rhs[self.start] = 0
+        self.push(self.start)
+        self.dirty: bool = True
+
+    def key(self, i: int) -> tuple[int]:
+        m: int = min(self.g[i], self.rhs[i])
+        return (m + self.astar.getDist(i, self.goal), m)
+
+    def push(self, i: int) -> None:
+        self.inOpen[i] = 1
+        heapq.heappush(self.open, (*self.key(i), i))
+
+    def updateVertex(self, i: int) -> None:
+        if i != self.start:
+            best: int = LPAstar.INF
+            if self.astar.grid[i]:
+                for n in self.astar.getNeighbors(i):
+                    if self.g[n] + 1 < best: best = self.g[n] + 1
+            self.rhs[i] = best
+        if self.g[i] != self.rhs[i]: self.push(i)
+        else: self.inOpen[i] = 0
+
+    def update(self, i: int) -> None:
+        '''Cell i turned into a wall or back, so the edges to its neighbours changed'''
+        self.updateVertex(i)
+        for n in self.astar.getNeighbors(i):
+            self.updateVertex(n)
+        self.dirty = True
+
+    def topKey(self) -> tuple[int]:
+        while self.open:
+            k1, k2, i = self.open[0]
+            if self.inOpen[i] and (k1, k2) == self.key(i): return (k1, k2)
+            heapq.heappop(self.open)
+        return (LPAstar.INF, LPAstar.INF)
+
+    def computeShortestPath(self) -> None:
+        g, rhs, goal = self.g, self.rhs, self.goal
+        while self.topKey() < self.key(goal) or rhs[goal] != g[goal]:
+            if not self.open: return
+            i: int = heapq.heappop(self.open)[2]
+            self.inOpen[i] = 0
+            self.expanded += 1
+            if g[i] > rhs[i]:
+                g[i] = rhs[i]
+            else:
+                g[i] = LPAstar.INF
+                self.updateVertex(i)
+            for n in self.astar.getNeighbors(i):
+                self.updateVertex(n)
+
+    def solve(self) -> list[tuple[int]]:
+        '''Repairs the search and returns the path from the goal back to the start'''
+        self.computeShortestPath()
+        self.dirty = False
+        if self.g[self.goal] >= LPAstar.INF: return []
+        cols: int = self.astar.cols
+        i: int = self.goal
+        path: list[tuple[int]] = [divmod(i, cols)]
+        while i != self.start:
+            i = min(self.astar.getNeighbors(i), key=self.g.__getitem__)
+            path.append(divmod(i, cols))
+        return path
+
+class HPAstar:
+    '''
+    Hierarchical A* over the grid of an Astar. The grid is split into size x size clusters, every run of
+    free cells along a cluster border gets one or two entrances, and the entrance cells of a cluster are
+    joined by their BFS distance inside it. Queries search this abstract graph and then refine each
+    abstract edge with a BFS local to one cluster. A cluster's abstraction is built the first time a
+    query reaches it and dropped again when place edits one of its cells.
+    '''
+    def __init__(self, astar: Astar, size: int = 16) -> None:
+        self.astar: Astar = astar
+        self.size: int = size
+        self.clusterRows: int = -(-astar.rows // size)
+        self.clusterCols: int = -(-astar.cols // size)
+        # cluster id -> {entrance cell: [(cell, cost)]}, intra-cluster edges and the crossings to other clusters
+        self.graphs: dict[int: dict[int: list[tuple[int]]]] = {}
+        self.expanded: int = 0
+
+    def getCluster(self, i: int) -> int:
+        r, c = divmod(i, self.astar.cols)
+        return (r // self.size) * self.clusterCols + c // self.size
+
+    def getBounds(self, k: int) -> tuple[int]:
+        kr, kc = divmod(k, self.clusterCols)
+        return (kr*self.size, min((kr+1)*self.size, self.astar.rows), kc*self.size, min((kc+1)*self.size, self.astar.cols))
+
+    def getEntrances(self, k: int) -> list[tuple[int]]:
+        '''(cell in k, cell across the border) for every entrance on the four borders of cluster k'''
+        r0, r1, c0, c1 = self.getBounds(k)
+        cols, grid = self.astar.cols, self.astar.grid
+        borders: list[list[int]] = []
+        if r0 > 0: borders.append([(r0*cols + c, -cols) for c in range(c0, c1)])
+        if r1 < self.astar.rows: borders.append([((r1-1)*cols + c, cols) for c in range(c0, c1)])
+        if c0 > 0: borders.append([(r*cols + c0, -1) for r in range(r0, r1)])
+        if c1 < cols: borders.append([(r*cols + c1-1, 1) for r in range(r0, r1)])
+        entrances: list[tuple[int]] = []
+        for border in borders:
+            run: list[int] = []
+            for i, step in border + [(-1, 0)]:
+                if i >= 0 and grid[i] and grid[i + step]:
+                    run.append(i)
+                    continue
+                if run:
+                    # Short runs get one entrance in the middle, long ones one at each end
+                    ends: list[int] = [run[len(run)//2]] if len(run) < 6 else [run[0], run[-1]]
+                    entrances.extend((e, e + border[0][1]) for e in ends)
+                run = []
+        return entrances
+
+    def bfs(self, src: int, k: int, parents: bool = False) -> dict[int: int]:
+        '''Distances (or parents) from src to every cell of cluster k it can reach without leaving k'''
+        r0, r1, c0, c1 = self.getBounds(k)
+        cols, grid = self.astar.cols, self.astar.grid
+        dist: dict[int: int] = {src: 0}
+        parent: dict[int: int] = {src: -1}
+        queue: list[int] = [src]
+        for i in queue:
+            r, c = divmod(i, cols)
+            d: int = dist[i] + 1
+            for n, ok in ((i - cols, r > r0), (i + cols, r < r1-1), (i - 1, c > c0), (i + 1, c < c1-1)):
+                if ok and grid[n] and n not in dist:
+                    dist[n] = d
+                    parent[n] = i
+                    queue.append(n)
+        return parent if parents else dist
+
+    def getGraph(self, k: int) -> dict[int: list[tuple[int]]]:
+        if k in self.graphs: return self.graphs[k]
+        graph: dict[int: list[tuple[int]]] = {}
+        for cell, other in self.getEntrances(k):
+            graph.setdefault(cell, []).append((other, 1))
+        for cell in graph:
+            dist: dict[int: int] = self.bfs(cell, k)
+            graph[cell].extend((n, dist[n]) for n in graph if n != cell and n in dist)
+        self.graphs[k] = graph
+        return graph
+
+    def update(self, i: int) -> None:
+        '''Cell i changed, drop the abstraction of its cluster and of any cluster sharing a border with it'''
+        k: int = self.getCluster(i)
+        self.graphs.pop(k, None)
+        r0, r1, c0, c1 = self.getBounds(k)
+        r, c = divmod(i, self.astar.cols)
+        if r == r0 and r0 > 0: self.graphs.pop(k - self.clusterCols, None)
+        if r == r1-1 and r1 < self.astar.rows: self.graphs.pop(k + self.clusterCols, None)
+        if c == c0 and c0 > 0: self.graphs.pop(k - 1, None)
+        if c == c1-1 and c1 < self.astar.cols: self.graphs.pop(k + 1, None)
+
+    def getPath(self, a: int, b: int) -> list[int]:
+        '''Cells from b back to a (excluding a) along a shortest path inside their cluster'''
+        if self.astar.getDist(a, b) == 1 and self.getCluster(a) != self.getCluster(b): return [b]
+        parent: dict[int: int] = self.bfs(a, self.getCluster(a), True)
+        path: list[int] = []
+        while b != a:
+            path.append(b)
+            b = parent[b]
+        return path
+
+    def solve(self, start: list[int], goal: list[int]) -> list[tuple[int]]:
+        '''Returns the refined path from the goal back to the start, empty if there is none'''
+        cols: int = self.astar.cols
+        s: int = start[0]*cols + start[1]
+        t: int = goal[0]*cols + goal[1]
+        ks, kt = self.getCluster(s), self.getCluster(t)
+        fromStart: dict[int: int] = self.bfs(s, ks)
+        toGoal: dict[int: int] = self.bfs(t, kt)
+        self.expanded = 0
+
+        g: dict[int: int] = {s: 0}
+        parent: dict[int: int] = {s: -1}
+        order = count()
+        heap: list[tuple[int]] = [(self.astar.getDist(s, t), 0, s)]
+        closed: set[int] = set()
+        while heap:
+            _, _, i = heapq.heappop(heap)
+            if i in closed: continue
+            closed.add(i)
+            self.expanded += 1
+            if i == t: break
+            k: int = self.getCluster(i)
+            edges: list[tuple[int]] = list(self.getGraph(k).get(i, []))
+            if i == s: edges.extend((n, d) for n, d in fromStart.items() if n in self.getGraph(ks) or n == t)
+            if k == kt and i in toGoal: edges.append((t, toGoal[i]))
+            for n, d in edges:
+                if n not in g or g[i] + d < g[n]:
+                    g[n] = g[i] + d
+                    parent[n] = i
+                    heapq.heappush(heap, (g[n] + self.astar.getDist(n, t), next(order), n))
+        if t not in closed: return []
+
+        path: list[int] = []
+        i: int = t
+        while parent[i] >= 0:
+            path.extend(self.getPath(parent[i], i))
+            i = parent[i]
+        path.append(s)
+        return [divmod(i, cols) for i in path]
+
+def benchmarkReplan(rows: int = 1000, cols: int = 1000, edits: int = 50, seed: int = 0) -> None:
+    '''Times LPA* repairs after single-cell edits against solving the edited grid again with A*'''
+    rng: random.Random = random.Random(seed)
+    astar: Astar = Astar(rows, cols)
+    for i in range(rows * cols):
+        if rng.random() < 0.25: astar.grid[i] = 0
+    astar.place((0, 0), Astar.states["start"])
+    astar.place((rows-1, cols-1), Astar.states["goal"])
+    t: float = time.perf_counter()
+    astar.plan()
+    print(f"{rows}x{cols}, initial LPA* search {time.perf_counter() - t:.2f} s, path of {len(astar.path)} cells")
+
+    repair: float = 0
+    full: float = 0
+    for e in range(edits):
+        # Half the edits land on the current path so they always force a repair
+        if e % 2 and len(astar.path) > 2: pos = astar.path[rng.randrange(1, len(astar.path)-1)]
+        else: pos = (rng.randrange(rows), rng.randrange(cols))
+        i: int = pos[0]*cols + pos[1]
+        if i in (astar.planner.start, astar.planner.goal): continue
+        t = time.perf_counter()
+        astar.place(pos, 1 - bool(astar.grid[i]))
+        astar.replan()
+        repair += time.perf_counter() - t
+
+        ref: Astar = Astar(rows, cols)
+        ref.grid[:] = astar.grid
+        t = time.perf_counter()
+        path: list[tuple[int]] = ref.solve(*astar.endPoints)
+        full += time.perf_counter() - t
+        if len(path) != len(astar.path): print(f"edit {e} at {pos}: MISMATCH {len(astar.path)} != {len(path)}")
+    print(f"{edits} single-cell edits: repair {repair/edits*1000:.1f} ms, full re-solve {full/edits*1000:.1f} ms ({full/repair:.1f}x)")
+
+def benchmarkHierarchy(rows: int = 1024, cols: int = 1024, queries: int = 10, seed: int = 0) -> None:
+    '''Times cold and cached HPA* queries between opposite sides of the grid against A*'''
+    rng: random.Random = random.Random(seed)
+    astar: Astar = Astar(rows, cols)
+    for i in range(rows * cols):
+        if rng.random() < 0.25: astar.grid[i] = 0
+    pairs: list[tuple[list[int]]] = []
+    for _ in range(queries):
+        start: list[int] = [rng.randrange(rows), rng.randrange(cols // 10 + 1)]
+        goal: list[int] = [rng.randrange(rows), cols - 1 - rng.randrange(cols // 10 + 1)]
+        astar.grid[start[0]*cols + start[1]] = astar.grid[goal[0]*cols + goal[1]] = 1
+        pairs.append((start, goal))
+    hpa: HPAstar = HPAstar(astar)
+    astar.hierarchy = hpa
+    print(f"{rows}x{cols}, {hpa.size}x{hpa.size} clusters, {queries} queries")
+
+    times: dict[str: float] = {"A*": 0, "HPA* cold": 0, "HPA* cached": 0}
+    length: dict[str: int] = {"A*": 0, "HPA* cached": 0}
+    for run in times:
+        for start, goal in pairs:
+            t: float = time.perf_counter()
+            path: list[tuple[int]] = astar.solve(start, goal) if run == "A*" else hpa.solve(start, goal)
+            times[run] += time.perf_counter() - t
+            if run in length: length[run] += len(path)
+    for run, t in times.items():
+        print(f"{run:<12} {t/queries*1000:>9.1f} ms/query ({times['A*']/t:.1f}x A*)")
+    print(f"HPA* paths are {length['HPA* cached']/length['A*']:.3f}x as long as A*")
+
+    r, c = pairs[0][0][0], cols // 2
+    t = time.perf_counter()
+    astar.place((r, c), 1 - bool(astar.grid[r*cols + c]))
+    hpa.solve(*pairs[0])
+    print(f"Query after a single-cell edit: {(time.perf_counter() - t)*1000:.1f} ms, {len(hpa.graphs)} clusters cached")
 
 class App:
     SIDE: int = 10
@@ -118,6 +569,7 @@ class App:
     ROWS: int = HEIGHT//SIDE
     COLS: int = WIDTH//SIDE
     FPS: int = 60
+    BUDGET: float = 8 # milliseconds of search per frame, at least one expansion always runs
     COLORS: dict[str: tuple[int]] = {"wall": (0, 0, 0), "empty": (255, 255, 255), "start": (0, 0, 255), "goal": (100, 200, 255), "open": (0, 255, 0), "closed": (255, 0, 0)}
     COLORSLIST: list[tuple[int]] = [i for i in COLORS.values()]
     blitPos: tuple[int] = (0, 0)
@@ -127,11 +579,18 @@ class App:
         print("Starting the Visualisation for A* Pathfinding Algorithm")
         print("ESC to Quit")
         print("Enter to start solving")
+        print("S to solve instantly without drawing the search")
         print("BACKSPACE | R to Clear")
         print("LEFT_CLICK to place Wall")
         print("RIGHT_CLICK to remove Wall")
         print("SCROLL_WHEEL_UP to place the Start Point")
         print("SCROLL_WHEEL_DOWN to place the End Point")
+        print("J to switch between A* and Jump Point Search")
+        print("T to switch the tie-breaking between cells of equal f")
+        print("D to switch between 4-connected and 8-connected moves")
+        print("I to plan incrementally, the path is repaired as walls are edited")
+        print("H to solve instantly with hierarchical A*, the cluster abstraction is kept between queries")
+        print("C to compare the expanded nodes and time of every mode and tie-break on the current grid")
         
         App.instance = self
 
@@ -142,24 +601,136 @@ class App:
 
         self.surf: pygame.Surface = pygame.Surface((self.WIDTH, self.HEIGHT))
         self.surfRect: pygame.Rect = self.surf.get_rect()
-        pygame.display.set_caption("A* Pathfinder")
 
-        self.astar: Astar = Astar()
+        self.dirty: set[tuple[int]] = set()
+        self.astar: Astar = Astar(view=self)
+        self.setCaption()
         self.mouseState: dict = {"down": False, "state": 0}
         self.clock = pygame.time.Clock()
 
     def update(self) -> None:
         pygame.display.update(self.WIN.blit(self.surf, App.blitPos))
+        self.dirty.clear()
     
     def updateGrid(self, row, col, clr) -> None:
+        '''Draws the cell on the surface only, the window catches up in flush once per frame'''
         pygame.draw.rect(self.surf, clr, (col*App.SIDE, row*App.SIDE, App.SIDE, App.SIDE))
-        self.update()
+        self.dirty.add((row, col))
+
+    def flush(self) -> None:
+        if not self.dirty: return
+        rects: list[pygame.Rect] = [pygame.Rect(c*App.SIDE, r*App.SIDE, App.SIDE, App.SIDE) for r, c in self.dirty]
+        pygame.display.update(self.WIN.blits([(self.surf, r.move(App.blitPos), r) for r in rects]))
+        self.dirty.clear()
+
+    def stepSearch(self) -> None:
+        '''Runs as many expansions as fit in App.BUDGET'''
+        deadline: float = time.perf_counter() + App.BUDGET / 1000
+        self.astar.solveNext()
+        while self.astar.solveStarted and time.perf_counter() < deadline:
+            self.astar.solveNext()
+
+    def solveInstantly(self) -> None:
+        if -1 in self.astar.endPoints[0] or -1 in self.astar.endPoints[1]:
+            print("Place the Start and End Points first")
+            return
+        self.astar.planner = None
+        self.redraw()
+        # Detached from the view the search draws nothing until the path is found
+        self.astar.view = None
+        self.astar.resetSearch()
+        self.astar.solveStart()
+        while self.astar.solveStarted:
+            self.astar.solveNext()
+        self.astar.view = self
+        if self.astar.current < 0:
+            print("No path found")
+            return
+        self.astar.getPath()
+        print(f"{self.astar.getName()}: expanded {self.astar.expanded} nodes in {self.astar.elapsed*1000:.1f} ms, path of {len(self.astar.path)} cells")
     
     def resetSurf(self) -> None:
         self.surf.fill(App.COLORS["empty"])
         drawGridLines(self.surf, App.ROWS, App.COLS, App.SIDE, App.COLORS["wall"])
         self.update()
     
+    def redraw(self) -> None:
+        self.surf.fill(App.COLORS["empty"])
+        for i, state in enumerate(self.astar.grid):
+            if state != Astar.states["empty"]:
+                r, c = divmod(i, self.astar.cols)
+                pygame.draw.rect(self.surf, App.COLORSLIST[state], (c*App.SIDE, r*App.SIDE, App.SIDE, App.SIDE))
+        drawGridLines(self.surf, App.ROWS, App.COLS, App.SIDE, App.COLORS["wall"])
+        self.update()
+
+    def plan(self) -> None:
+        if -1 in self.astar.endPoints[0] or -1 in self.astar.endPoints[1]:
+            print("Place the Start and End Points first")
+            return
+        if self.astar.diagonal:
+            print("Incremental planning only runs on the 4-connected grid")
+            return
+        self.redraw()
+        self.astar.plan()
+
+    def solveHierarchy(self) -> None:
+        if -1 in self.astar.endPoints[0] or -1 in self.astar.endPoints[1]:
+            print("Place the Start and End Points first")
+            return
+        if self.astar.diagonal:
+            print("Hierarchical A* only runs on the 4-connected grid")
+            return
+        self.astar.planner = None
+        if self.astar.hierarchy is None: self.astar.hierarchy = HPAstar(self.astar)
+        self.redraw()
+        t: float = time.perf_counter()
+        self.astar.path = self.astar.hierarchy.solve(*self.astar.endPoints)
+        t = time.perf_counter() - t
+        for r, c in self.astar.path:
+            self.astar.updateGrid(r, c, App.COLORS["goal"])
+        print(f"HPA*: expanded {self.astar.hierarchy.expanded} abstract nodes in {t*1000:.1f} ms, path of {len(self.astar.path)} cells")
+
+    def setCaption(self) -> None:
+        pygame.display.set_caption(f"A* Pathfinder - {self.astar.getName()}")
+
+    def switchMode(self) -> None:
+        if self.astar.solveStarted: return
+        if self.astar.diagonal:
+            print("Jump Point Search only runs on the 4-connected grid")
+            return
+        modes: list[str] = Astar.MODES
+        self.astar.mode = modes[(modes.index(self.astar.mode) + 1) % len(modes)]
+        self.setCaption()
+
+    def switchTieBreak(self) -> None:
+        if self.astar.solveStarted: return
+        ties: list[str] = Astar.TIEBREAKS
+        self.astar.tieBreak = ties[(ties.index(self.astar.tieBreak) + 1) % len(ties)]
+        self.setCaption()
+
+    def switchDiagonal(self) -> None:
+        if self.astar.solveStarted: return
+        self.astar.diagonal = not self.astar.diagonal
+        if self.astar.diagonal:
+            # JPS and the incremental planner are 4-connected only
+            self.astar.mode = "A*"
+            self.astar.planner = None
+        self.setCaption()
+
+    def compare(self) -> None:
+        '''Solves the current grid headless with every mode and tie-break, timing only the search'''
+        if -1 in self.astar.endPoints[0] or -1 in self.astar.endPoints[1]:
+            print("Place the Start and End Points first")
+            return
+        print(f"{'mode':<5} {'moves':>5} {'ties':<8} {'expanded':>9} {'ms':>9} {'cost':>8}")
+        for diagonal, mode in ((False, "A*"), (False, "JPS"), (True, "A*")):
+            for tieBreak in Astar.TIEBREAKS:
+                astar: Astar = Astar(self.astar.rows, self.astar.cols, mode=mode, tieBreak=tieBreak, diagonal=diagonal)
+                astar.grid[:] = self.astar.grid
+                path: list[tuple[int]] = astar.solve(*self.astar.endPoints)
+                cost: str = f"{astar.g[astar.goal]:.2f}" if path else "-"
+                print(f"{mode:<5} {8 if diagonal else 4:>5} {tieBreak:<8} {astar.expanded:>9} {astar.elapsed*1000:>9.2f} {cost:>8}")
+
     def getPosFromMouse() -> tuple[int]:
         pos = pygame.mouse.get_pos()
         return ((pos[1] - App.blitPos[1])//App.SIDE, (pos[0] - App.blitPos[0])//App.SIDE)
@@ -178,9 +749,26 @@ class App:
                                 self.quit()
                                 return True
                             case pygame.K_RETURN:
+                                self.astar.planner = None
+                                self.redraw()
+                                self.astar.resetSearch()
                                 self.astar.solveStart()
+                            case pygame.K_s:
+                                if not self.astar.solveStarted: self.solveInstantly()
                             case pygame.K_BACKSPACE | pygame.K_r:
                                 self.astar.reset()
+                            case pygame.K_j:
+                                self.switchMode()
+                            case pygame.K_t:
+                                self.switchTieBreak()
+                            case pygame.K_d:
+                                self.switchDiagonal()
+                            case pygame.K_c:
+                                self.compare()
+                            case pygame.K_h:
+                                if not self.astar.solveStarted: self.solveHierarchy()
+                            case pygame.K_i:
+                                if not self.astar.solveStarted: self.plan()
                     
                     case pygame.MOUSEBUTTONDOWN:
                         match event.button:
@@ -196,15 +784,23 @@ class App:
                         self.mouseState["down"] = False
                         if self.astar.solveStarted: App.FPS += 20
 
-            if self.astar.solveStarted: self.astar.solveNext()
+            if self.astar.solveStarted: self.stepSearch()
             elif self.mouseState["down"]: self.astar.place(App.getPosFromMouse(), self.mouseState["state"])
+            if self.astar.planner is not None and self.astar.planner.dirty: self.astar.replan()
+            self.flush()
         
     
     def quit(self):
         pygame.display.set_caption("Visualisations")
 
 if __name__ == "__main__":
-    WIN: pygame.Surface = pygame.display.set_mode((App.WIDTH, App.HEIGHT))
-    app: App = App(WIN)
-    app.mainloop()
-    pygame.quit()
\ No newline at end of file
+    import sys
+    if "--bench-replan" in sys.argv:
+        benchmarkReplan(*map(int, sys.argv[sys.argv.index("--bench-replan")+1:]))
+    elif "--bench-hpa" in sys.argv:
+        benchmarkHierarchy(*map(int, sys.argv[sys.argv.index("--bench-hpa")+1:]))
+    else:
+        WIN: pygame.Surface = pygame.display.set_mode((App.WIDTH, App.HEIGHT))
+        app: App = App(WIN)
+        app.mainloop()
+        pygame.quit()
\ No newline at end of file
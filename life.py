@@ -1,22 +1,63 @@
 '''
 Cellular Automata (2D) : Conway's Game of Life
 '''
-import pygame, random
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # Spawned workers re-import this module
+import pygame, time, zlib
+import numpy as np
+from collections import deque, OrderedDict
+from multiprocessing import get_context, shared_memory
 from utils import drawGridLines
 
+class Rule:
+    '''
+    Outer-totalistic rule like "B36/S23", compiled into an 18-entry table indexed by alive*9 + neighbours
+    '''
+    def __init__(self, rule: str = "B3/S23") -> None:
+        parts: dict[str: str] = {p[:1].upper(): p[1:] for p in rule.replace(" ", "").split("/")}
+        if set(parts) != {"B", "S"} or not all(ch in "012345678" for ch in parts["B"] + parts["S"]):
+            raise ValueError(f"Invalid rule string: {rule!r}, expected something like 'B3/S23'")
+        if "0" in parts["B"]:
+            raise ValueError("B0 rules are not supported, they turn the whole plane on every generation")
+        self.birth: list[int] = sorted(set(map(int, parts["B"])))
+        self.survive: list[int] = sorted(set(map(int, parts["S"])))
+        self.table: list[int] = [int(n in self.birth) for n in range(9)] + [int(n in self.survive) for n in range(9)]
+        self.array: np.ndarray = np.array(self.table, dtype=np.uint8)
+
+    def __str__(self) -> str:
+        return f"B{''.join(map(str, self.birth))}/S{''.join(map(str, self.survive))}"
+
 class Life:
-    def __init__(self) -> None:
+    NAME: str = "Python"
+    TORUS: bool = True # Edges wrap around, boards match cell for cell across engines that do
+    def __init__(self, rows: int = 0, cols: int = 0) -> None:
+        self.rows: int = rows or App.ROWS
+        self.cols: int = cols or App.COLS
+        self.rule: Rule = Rule()
         self.running: bool = False
+        self.generation: int = 0
         self.resetGrid()
         self.saved: list[list[int]] = []
 
     def resetGrid(self, rand: bool = False) -> None:
-        self.grid: list[list[int]] = [[0 if not rand else random.choice([0, 1, 0, 0, 0]) for i in range(App.COLS)] for j in range(App.ROWS)]
+        self.grid: list[list[int]] = self.randomArray().tolist() if rand else [[0] * self.cols for j in range(self.rows)]
     
-    def place(self, pos: list[int], s: int) -> None:
+    def cellAt(self, pos: list[int]) -> tuple[int]:
+        '''(row, col) of the cell under a window position, None outside the board'''
         if 0 <= pos[0] < App.WIDTH and 0 <= pos[1] < App.HEIGHT:
             r, c = pos[1]//App.SIDE, pos[0]//App.SIDE
-            self.grid[r][c] = s
+            if r < self.rows and c < self.cols: return r, c
+        return None
+
+    def place(self, pos: list[int], s: int) -> None:
+        if (cell := self.cellAt(pos)) is not None: self.set(*cell, s)
+
+    def set(self, r: int, c: int, s: int) -> None:
+        self.grid[r][c] = s
+
+    def randomArray(self) -> np.ndarray:
+        '''Random board with about a fifth of the cells alive'''
+        return (np.random.random((self.rows, self.cols)) < 0.2).astype(np.uint8)
     
     def numAlive(self, r: int, c: int) -> int:
         n: int = 0
@@ -25,24 +66,29 @@ class Life:
                 if not i and not j: continue
                 newR: int = r+i
                 newC: int = c+j
-                if newR >= App.ROWS: newR %= App.ROWS
-                if newC >= App.COLS: newC %= App.COLS
+                if newR >= self.rows: newR %= self.rows
+                if newC >= self.cols: newC %= self.cols
                 if (self.grid[newR][newC]):
                     n += 1
         return n
 
+    def setRule(self, rule: Rule) -> None:
+        self.rule = rule
+
     def next(self) -> None:
         nextGrid: list[list[int]] = [[0 for j in i] for i in self.grid]
+        table: list[int] = self.rule.table
         for i, row in enumerate(self.grid):
             for j, val in enumerate(row):
-                n = self.numAlive(i, j)
-                if  n == 3: 
-                    nextGrid[i][j] = 1
-                elif n == 2:
-                    nextGrid[i][j] = val            
+                nextGrid[i][j] = table[val*9 + self.numAlive(i, j)]
         for i, row in enumerate(nextGrid):
             for j, val in enumerate(row):
                 self.grid[i][j] = val
+        self.generation += 1
+
+    def run(self, gens: int) -> None:
+        for _ in range(gens):
+            self.next()
     
     def save(self) -> None:
         self.saved: list[list[int]] = []
@@ -57,6 +103,720 @@ class Life:
             for j, val in enumerate(row):
                 self.grid[i][j] = val
 
+    def toArray(self) -> np.ndarray:
+        return np.array(self.grid, dtype=np.uint8)
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        self.grid = arr.astype(np.uint8).tolist()
+
+    def close(self) -> None:
+        pass
+
+class LifeNumPy(Life):
+    '''Keeps the grid as a NumPy array and steps the whole board at once'''
+    NAME: str = "NumPy"
+    def __init__(self, rows: int = 0, cols: int = 0) -> None:
+        super().__init__(rows, cols)
+        self.saved: np.ndarray = None
+
+    def resetGrid(self, rand: bool = False) -> None:
+        if rand:
+            self.grid: np.ndarray = self.randomArray()
+        else:
+            self.grid: np.ndarray = np.zeros((self.rows, self.cols), dtype=np.uint8)
+
+    def set(self, r: int, c: int, s: int) -> None:
+        self.grid[r, c] = s
+
+    def numAliveAll(self) -> np.ndarray:
+        # Same toroidal wrap as numAlive: sum the 3 rows, then the 3 columns, minus the cell itself
+        g: np.ndarray = self.grid
+        v: np.ndarray = g + np.roll(g, 1, 0) + np.roll(g, -1, 0)
+        return v + np.roll(v, 1, 1) + np.roll(v, -1, 1) - g
+
+    def next(self) -> None:
+        n: np.ndarray = self.numAliveAll()
+        self.grid = self.rule.array[self.grid*9 + n]
+        self.generation += 1
+
+    def save(self) -> None:
+        self.saved = self.grid.copy()
+
+    def load(self) -> None:
+        if self.saved is None: return
+        np.copyto(self.grid, self.saved)
+
+    def toArray(self) -> np.ndarray:
+        return self.grid.copy()
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        self.grid = arr.astype(np.uint8)
+
+class QuadNode:
+    __slots__ = ("nw", "ne", "sw", "se", "level", "pop")
+    def __init__(self, nw, ne, sw, se, level: int, pop: int) -> None:
+        self.nw: QuadNode = nw
+        self.ne: QuadNode = ne
+        self.sw: QuadNode = sw
+        self.se: QuadNode = se
+        self.level: int = level
+        self.pop: int = pop
+
+class HashLife(Life):
+    '''
+    Hashlife on a canonicalized quadtree. The board is an unbounded plane (no toroidal wrap),
+    the App shows the ROWS x COLS viewport whose top-left cell is (0, 0).
+    next() advances 2**stepLog generations at once.
+    '''
+    NAME: str = "HashLife"
+    TORUS: bool = False
+    OFF: QuadNode = QuadNode(None, None, None, None, 0, 0)
+    ON: QuadNode = QuadNode(None, None, None, None, 0, 1)
+    def __init__(self, rows: int = 0, cols: int = 0, maxCache: int = 1 << 20) -> None:
+        self.maxCache: int = maxCache
+        self.nodes: dict[tuple[QuadNode], QuadNode] = {}
+        self.cache: dict[tuple[QuadNode, int], QuadNode] = {}
+        self.empties: list[QuadNode] = [HashLife.OFF]
+        self.stepLog: int = 0
+        super().__init__(rows, cols)
+        self.saved: tuple[QuadNode, int] = None
+
+    def join(self, nw: QuadNode, ne: QuadNode, sw: QuadNode, se: QuadNode) -> QuadNode:
+        key: tuple[QuadNode] = (nw, ne, sw, se)
+        node: QuadNode = self.nodes.get(key)
+        if node is None:
+            node = QuadNode(nw, ne, sw, se, nw.level + 1, nw.pop + ne.pop + sw.pop + se.pop)
+            self.nodes[key] = node
+        return node
+
+    def empty(self, level: int) -> QuadNode:
+        while len(self.empties) <= level:
+            e: QuadNode = self.empties[-1]
+            self.empties.append(self.join(e, e, e, e))
+        return self.empties[level]
+
+    def expand(self, node: QuadNode) -> QuadNode:
+        # Same node centred in a tree one level higher
+        e: QuadNode = self.empty(node.level - 1)
+        return self.join(self.join(e, e, e, node.nw), self.join(e, e, node.ne, e),
+                         self.join(e, node.sw, e, e), self.join(node.se, e, e, e))
+
+    def life4x4(self, node: QuadNode) -> QuadNode:
+        # Centre 2x2 of a 4x4 node after one generation
+        a, b, c, d = node.nw, node.ne, node.sw, node.se
+        cells: list[list[int]] = [
+            [a.nw.pop, a.ne.pop, b.nw.pop, b.ne.pop],
+            [a.sw.pop, a.se.pop, b.sw.pop, b.se.pop],
+            [c.nw.pop, c.ne.pop, d.nw.pop, d.ne.pop],
+            [c.sw.pop, c.se.pop, d.sw.pop, d.se.pop]]
+        res: list[QuadNode] = []
+        table: list[int] = self.rule.table
+        for r, col in ((1, 1), (1, 2), (2, 1), (2, 2)):
+            n: int = sum(cells[r+i][col+j] for i in range(-1, 2) for j in range(-1, 2)) - cells[r][col]
+            res.append(HashLife.ON if table[cells[r][col]*9 + n] else HashLife.OFF)
+        return self.join(*res)
+
+    def step(self, node: QuadNode, j: int) -> QuadNode:
+        '''Centre of a level k node advanced 2**j generations (j <= k-2)'''
+        if not node.pop: return node.nw
+        key: tuple[QuadNode, int] = (node, j)
+        res: QuadNode = self.cache.get(key)
+        if res is not None: return res
+
+        if node.level == 2:
+            res = self.life4x4(node)
+        else:
+            a, b, c, d = node.nw, node.ne, node.sw, node.se
+            # 9 overlapping sub-squares, each advanced by 2**j (or 2**(j-1) twice when j is the maximum)
+            inner: int = j if j < node.level - 2 else j - 1
+            c1 = self.step(a, inner)
+            c2 = self.step(self.join(a.ne, b.nw, a.se, b.sw), inner)
+            c3 = self.step(b, inner)
+            c4 = self.step(self.join(a.sw, a.se, c.nw, c.ne), inner)
+            c5 = self.step(self.join(a.se, b.sw, c.ne, d.nw), inner)
+            c6 = self.step(self.join(b.sw, b.se, d.nw, d.ne), inner)
+            c7 = self.step(c, inner)
+            c8 = self.step(self.join(c.ne, d.nw, c.se, d.sw), inner)
+            c9 = self.step(d, inner)
+            if j < node.level - 2:
+                res = self.join(
+                    self.join(c1.se, c2.sw, c4.ne, c5.nw),
+                    self.join(c2.se, c3.sw, c5.ne, c6.nw),
+                    self.join(c4.se, c5.sw, c7.ne, c8.nw),
+                    self.join(c5.se, c6.sw, c8.ne, c9.nw))
+            else:
+                res = self.join(
+                    self.step(self.join(c1, c2, c4, c5), inner),
+                    self.step(self.join(c2, c3, c5, c6), inner),
+                    self.step(self.join(c4, c5, c7, c8), inner),
+                    self.step(self.join(c5, c6, c8, c9), inner))
+        self.cache[key] = res
+        return res
+
+    def setRule(self, rule: Rule) -> None:
+        # Memoized results are only valid for the rule they were computed with
+        self.rule = rule
+        self.cache.clear()
+
+    def isCentred(self, node: QuadNode) -> bool:
+        inner: int = node.nw.se.se.pop + node.ne.sw.sw.pop + node.sw.ne.ne.pop + node.se.nw.nw.pop
+        return inner == node.pop
+
+    def next(self) -> None:
+        root: QuadNode = self.root
+        while root.level < self.stepLog + 3 or not self.isCentred(root):
+            root = self.expand(root)
+        self.root = self.step(root, self.stepLog)
+        self.generation += 1 << self.stepLog
+        if len(self.nodes) + len(self.cache) > self.maxCache:
+            self.collect()
+
+    def run(self, gens: int) -> None:
+        # One jump per set bit of gens
+        stepLog: int = self.stepLog
+        for bit in range(gens.bit_length()):
+            if gens >> bit & 1:
+                self.stepLog = bit
+                self.next()
+        self.stepLog = stepLog
+
+    def collect(self) -> None:
+        '''Evicts the memoized results and every node not reachable from the live trees'''
+        self.cache.clear()
+        self.nodes.clear()
+        self.empties = [HashLife.OFF]
+        seen: set[int] = set()
+        stack: list[QuadNode] = [self.root] + ([self.saved[0]] if self.saved else [])
+        while stack:
+            node: QuadNode = stack.pop()
+            if node.level == 0 or id(node) in seen: continue
+            seen.add(id(node))
+            self.nodes[(node.nw, node.ne, node.sw, node.se)] = node
+            stack.extend((node.nw, node.ne, node.sw, node.se))
+
+    def resetGrid(self, rand: bool = False) -> None:
+        self.generation: int = 0
+        if rand:
+            self.fromArray(self.randomArray())
+        else:
+            self.root: QuadNode = self.empty(3)
+
+    def setCell(self, node: QuadNode, x: int, y: int, s: int) -> QuadNode:
+        if node.level == 0: return HashLife.ON if s else HashLife.OFF
+        half: int = 1 << (node.level - 1)
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        if y < half:
+            if x < half: nw = self.setCell(nw, x, y, s)
+            else: ne = self.setCell(ne, x - half, y, s)
+        else:
+            if x < half: sw = self.setCell(sw, x, y - half, s)
+            else: se = self.setCell(se, x - half, y - half, s)
+        return self.join(nw, ne, sw, se)
+
+    def set(self, r: int, c: int, s: int) -> None:
+        half: int = 1 << (self.root.level - 1)
+        while not (-half <= r < half and -half <= c < half):
+            self.root = self.expand(self.root)
+            half <<= 1
+        self.root = self.setCell(self.root, c + half, r + half, s)
+
+    def cells(self):
+        '''Live cells inside the viewport, skipping empty and off-screen subtrees'''
+        half: int = 1 << (self.root.level - 1)
+        stack: list[tuple[QuadNode, int, int]] = [(self.root, -half, -half)]
+        while stack:
+            node, x, y = stack.pop()
+            size: int = 1 << node.level
+            if not node.pop or x >= self.cols or y >= self.rows or x + size <= 0 or y + size <= 0: continue
+            if node.level == 0:
+                yield y, x
+                continue
+            size >>= 1
+            stack.extend(((node.nw, x, y), (node.ne, x + size, y), (node.sw, x, y + size), (node.se, x + size, y + size)))
+
+    def build(self, arr: np.ndarray, level: int) -> QuadNode:
+        if not arr.any(): return self.empty(level)
+        if level == 0: return HashLife.ON
+        half: int = 1 << (level - 1)
+        return self.join(self.build(arr[:half, :half], level - 1), self.build(arr[:half, half:], level - 1),
+                         self.build(arr[half:, :half], level - 1), self.build(arr[half:, half:], level - 1))
+
+    def toArray(self) -> np.ndarray:
+        arr: np.ndarray = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        for r, c in self.cells():
+            arr[r, c] = 1
+        return arr
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        level: int = max(3, (max(arr.shape) - 1).bit_length() + 1)
+        size: int = 1 << (level - 1)
+        padded: np.ndarray = np.zeros((size, size), dtype=np.uint8)
+        padded[:arr.shape[0], :arr.shape[1]] = arr
+        e: QuadNode = self.empty(level - 1)
+        self.root = self.join(e, e, e, self.build(padded, level - 1))
+
+    def save(self) -> None:
+        self.saved = (self.root, self.generation)
+
+    def load(self) -> None:
+        if self.saved is None: return
+        self.root, self.generation = self.saved
+
+class SparseLife(Life):
+    '''
+    Keeps only the set of live cells plus the frontier of cells whose neighbourhood changed
+    in the last step, so a generation costs O(active cells) instead of O(ROWS*COLS).
+    '''
+    NAME: str = "Sparse"
+    OFFSETS: tuple[tuple[int]] = tuple((i, j) for i in range(-1, 2) for j in range(-1, 2) if i or j)
+    def __init__(self, rows: int = 0, cols: int = 0) -> None:
+        super().__init__(rows, cols)
+        self.saved: frozenset[tuple[int]] = None
+
+    def resetGrid(self, rand: bool = False) -> None:
+        self.live: set[tuple[int]] = set()
+        self.frontier: set[tuple[int]] = set()
+        self.changed: list[tuple[int]] = []
+        self.active: int = 0
+        if rand:
+            for r, c in np.argwhere(self.randomArray()).tolist(): self.set(r, c, 1)
+
+    def touch(self, r: int, c: int) -> None:
+        self.frontier.add((r, c))
+        for i, j in SparseLife.OFFSETS:
+            self.frontier.add(((r+i) % self.rows, (c+j) % self.cols))
+
+    def set(self, r: int, c: int, s: int) -> None:
+        if ((r, c) in self.live) == bool(s): return
+        if s: self.live.add((r, c))
+        else: self.live.discard((r, c))
+        self.touch(r, c)
+
+    def numAlive(self, r: int, c: int) -> int:
+        live: set[tuple[int]] = self.live
+        return sum(((r+i) % self.rows, (c+j) % self.cols) in live for i, j in SparseLife.OFFSETS)
+
+    def next(self) -> None:
+        candidates: set[tuple[int]] = self.frontier
+        self.active = len(candidates)
+        table: list[int] = self.rule.table
+        changed: list[tuple[int]] = []
+        for r, c in candidates:
+            alive: int = (r, c) in self.live
+            if alive != table[alive*9 + self.numAlive(r, c)]:
+                changed.append((r, c))
+
+        self.frontier = set()
+        for cell in changed:
+            if cell in self.live: self.live.discard(cell)
+            else: self.live.add(cell)
+            self.touch(*cell)
+        self.changed: list[tuple[int]] = changed
+        self.generation += 1
+
+    def setRule(self, rule: Rule) -> None:
+        # Cells that were stable under the old rule may not be under the new one
+        self.rule = rule
+        for cell in self.live:
+            self.touch(*cell)
+
+    def save(self) -> None:
+        self.saved = frozenset(self.live)
+
+    def load(self) -> None:
+        if self.saved is None: return
+        for cell in self.live ^ self.saved:
+            self.touch(*cell)
+        self.live = set(self.saved)
+
+    def toArray(self) -> np.ndarray:
+        arr: np.ndarray = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        for r, c in self.live:
+            arr[r, c] = 1
+        return arr
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        self.resetGrid()
+        for r, c in np.argwhere(arr):
+            self.set(int(r), int(c), 1)
+
+class BitLife(Life):
+    '''
+    Each row is packed into one Python int (bit c = column c) and a generation is computed for whole
+    rows at once with bit-parallel adders. Snapshots are rows*ceil(cols/8) bytes.
+    '''
+    NAME: str = "BitPacked"
+    def __init__(self, rows: int = 0, cols: int = 0) -> None:
+        super().__init__(rows, cols)
+        self.saved: bytes = None
+
+    def resetGrid(self, rand: bool = False) -> None:
+        self.mask: int = (1 << self.cols) - 1
+        if rand:
+            self.fromArray(self.randomArray())
+        else:
+            self.grid: list[int] = [0] * self.rows
+
+    def set(self, r: int, c: int, s: int) -> None:
+        if s: self.grid[r] |= 1 << c
+        else: self.grid[r] &= ~(1 << c)
+
+    @staticmethod
+    def countEquals(counts: tuple[int], n: int) -> int:
+        '''Bits of the cells whose neighbour count, given as bit planes (t0, t1, t2, t3), equals n'''
+        res: int = -1
+        for bit, t in enumerate(counts):
+            res &= t if n >> bit & 1 else ~t
+        return res
+
+    def next(self) -> None:
+        cols, mask = self.cols, self.mask
+        birth, survive = self.rule.birth, self.rule.survive
+        sum3: list[tuple[int]] = []
+        sum2: list[tuple[int]] = []
+        for x in self.grid:
+            # West and east neighbours of every cell in the row, wrapping around like numAlive
+            w: int = ((x << 1) | (x >> (cols - 1))) & mask
+            e: int = (x >> 1) | ((x & 1) << (cols - 1))
+            we: int = w ^ e
+            sum3.append((we ^ x, (w & e) | (x & we)))
+            sum2.append((we, w & e))
+
+        nextGrid: list[int] = []
+        for r, x in enumerate(self.grid):
+            a0, a1 = sum3[r - 1]
+            b0, b1 = sum3[(r + 1) % self.rows]
+            d0, d1 = sum2[r]
+            # (a1 a0) + (b1 b0) -> (s2 s1 s0)
+            s0: int = a0 ^ b0
+            k: int = a0 & b0
+            s1: int = a1 ^ b1 ^ k
+            s2: int = (a1 & b1) | (k & (a1 ^ b1))
+            # (s2 s1 s0) + (d1 d0) -> (t3 t2 t1 t0)
+            t0: int = s0 ^ d0
+            k = s0 & d0
+            t1: int = s1 ^ d1 ^ k
+            k = (s1 & d1) | (k & (s1 ^ d1))
+            t2: int = s2 ^ k
+            t3: int = s2 & k
+            counts: tuple[int] = (t0, t1, t2, t3)
+            born: int = 0
+            for n in birth: born |= self.countEquals(counts, n)
+            kept: int = 0
+            for n in survive: kept |= self.countEquals(counts, n)
+            nextGrid.append(((born & ~x) | (kept & x)) & mask)
+        self.grid = nextGrid
+        self.generation += 1
+
+    def snapshot(self) -> bytes:
+        n: int = (self.cols + 7) // 8
+        return b"".join(x.to_bytes(n, "little") for x in self.grid)
+
+    def restore(self, data: bytes) -> None:
+        n: int = (self.cols + 7) // 8
+        self.grid = [int.from_bytes(data[i:i+n], "little") for i in range(0, len(data), n)]
+
+    def save(self) -> None:
+        self.saved = self.snapshot()
+
+    def load(self) -> None:
+        if self.saved is None: return
+        self.restore(self.saved)
+
+    def toArray(self) -> np.ndarray:
+        bits: np.ndarray = np.unpackbits(np.frombuffer(self.snapshot(), dtype=np.uint8).reshape(self.rows, -1), axis=1, bitorder="little")
+        return bits[:, :self.cols].copy()
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        self.restore(np.packbits(arr.astype(np.uint8), axis=1, bitorder="little").tobytes())
+
+def tileWorker(names: list[str], heights: list[int], cols: int, idx: int, barrier, conn) -> None:
+    '''Steps one horizontal tile of a ParallelLife board, buffers are (2, height+2, cols) with halo rows'''
+    mems: list[shared_memory.SharedMemory] = [shared_memory.SharedMemory(name=name) for name in names]
+    bufs: list[np.ndarray] = [np.ndarray((2, h + 2, cols), dtype=np.uint8, buffer=m.buf) for m, h in zip(mems, heights)]
+    tile: np.ndarray = bufs[idx]
+    above: np.ndarray = bufs[idx - 1]
+    below: np.ndarray = bufs[(idx + 1) % len(bufs)]
+    parity: int = 0
+    while (cmd := conn.recv()) is not None:
+        gens, table = cmd
+        for _ in range(gens):
+            # Halo exchange: our edge rows become the neighbours' halo rows
+            above[parity, -1] = tile[parity, 1]
+            below[parity, 0] = tile[parity, -2]
+            barrier.wait()
+            g: np.ndarray = tile[parity]
+            v: np.ndarray = g[:-2] + g[1:-1] + g[2:]
+            n: np.ndarray = v + np.roll(v, 1, 1) + np.roll(v, -1, 1) - g[1:-1]
+            tile[1 - parity, 1:-1] = table[g[1:-1]*9 + n]
+            parity = 1 - parity
+        conn.send(parity)
+    del tile, above, below, bufs
+    for m in mems: m.close()
+
+class ParallelLife(Life):
+    '''
+    Splits the board into horizontal tiles in shared memory, each stepped by its own process.
+    Workers exchange one-row halos and meet at a barrier every generation.
+    '''
+    NAME: str = "Parallel"
+    def __init__(self, rows: int = 0, cols: int = 0, workers: int = 0) -> None:
+        self.rows: int = rows or App.ROWS
+        self.cols: int = cols or App.COLS
+        self.startWorkers(min(workers or os.cpu_count(), self.rows))
+        super().__init__(rows, cols)
+        self.saved: np.ndarray = None
+
+    def startWorkers(self, workers: int) -> None:
+        heights: list[int] = [len(a) for a in np.array_split(np.arange(self.rows), workers)]
+        self.mems: list[shared_memory.SharedMemory] = [shared_memory.SharedMemory(create=True, size=2*(h+2)*self.cols) for h in heights]
+        self.bufs: list[np.ndarray] = [np.ndarray((2, h + 2, self.cols), dtype=np.uint8, buffer=m.buf) for m, h in zip(self.mems, heights)]
+        self.offsets: list[int] = [sum(heights[:i]) for i in range(workers)]
+        self.parity: int = 0
+        # Spawned rather than forked, forking the running pygame App can deadlock the workers
+        ctx = get_context("spawn")
+        # Kept on self, spawned workers attach to the barrier's semaphores after start() returns
+        self.barrier = ctx.Barrier(workers)
+        self.conns: list = []
+        self.procs: list = []
+        for i in range(workers):
+            conn, child = ctx.Pipe()
+            p = ctx.Process(target=tileWorker, args=([m.name for m in self.mems], heights, self.cols, i, self.barrier, child), daemon=True)
+            p.start()
+            self.conns.append(conn)
+            self.procs.append(p)
+
+    def run(self, gens: int) -> None:
+        for conn in self.conns: conn.send((gens, self.rule.array))
+        for conn in self.conns: self.parity = conn.recv()
+        self.generation += gens
+
+    def next(self) -> None:
+        self.run(1)
+
+    def tiles(self) -> list[np.ndarray]:
+        return [b[self.parity, 1:-1] for b in self.bufs]
+
+    def resetGrid(self, rand: bool = False) -> None:
+        if rand:
+            self.fromArray(self.randomArray())
+        else:
+            for t in self.tiles(): t[:] = 0
+
+    def set(self, r: int, c: int, s: int) -> None:
+        i: int = np.searchsorted(self.offsets, r, side="right") - 1
+        self.tiles()[i][r - self.offsets[i], c] = s
+
+    def toArray(self) -> np.ndarray:
+        return np.concatenate(self.tiles())
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        for t, off in zip(self.tiles(), self.offsets):
+            t[:] = arr[off:off + len(t)]
+
+    def save(self) -> None:
+        self.saved = self.toArray()
+
+    def load(self) -> None:
+        if self.saved is None: return
+        self.fromArray(self.saved)
+
+    def close(self) -> None:
+        if not self.procs: return
+        for conn in self.conns: conn.send(None)
+        for p in self.procs: p.join()
+        self.procs = []
+        del self.bufs
+        for m in self.mems:
+            m.close()
+            m.unlink()
+
+def benchmarkParallel(rows: int = 2000, cols: int = 2000, gens: int = 50, maxWorkers: int = 0) -> None:
+    '''Prints generations per second against worker count, checking every run against LifeNumPy'''
+    start: np.ndarray = (np.random.random((rows, cols)) < 0.2).astype(np.uint8)
+    ref: LifeNumPy = LifeNumPy(rows, cols)
+    ref.fromArray(start)
+    t: float = time.perf_counter()
+    for _ in range(gens): ref.next()
+    base: float = gens / (time.perf_counter() - t)
+    print(f"{rows}x{cols}, {gens} generations")
+    print(f"NumPy (1 process): {base:.1f} gen/s")
+
+    workers: int = 1
+    while workers <= (maxWorkers or os.cpu_count()):
+        life: ParallelLife = ParallelLife(rows, cols, workers)
+        life.fromArray(start)
+        life.run(0) # Waits for the spawned workers to start
+        t = time.perf_counter()
+        life.run(gens)
+        rate: float = gens / (time.perf_counter() - t)
+        same: bool = np.array_equal(life.toArray(), ref.grid)
+        life.close()
+        print(f"{workers} workers: {rate:.1f} gen/s ({rate/base:.2f}x){'' if same else ' MISMATCH'}")
+        workers *= 2
+
+class History:
+    '''
+    Ring buffer of board states for rewinding. Every frame stores the zlib-compressed XOR delta
+    from the previous frame, every keyEvery-th frame also stores a compressed keyframe.
+    The oldest keyframe group is evicted once the stored bytes exceed maxBytes, except the group
+    holding the current frame, so the front frame is always a keyframe.
+    '''
+    def __init__(self, keyEvery: int = 64, maxBytes: int = 64 << 20) -> None:
+        self.keyEvery: int = keyEvery
+        self.maxBytes: int = maxBytes
+        self.clear()
+
+    def clear(self) -> None:
+        # frames[i] = (keyframe or None, delta from frame i-1 or None, generation)
+        self.frames: deque[tuple[bytes, bytes, int]] = deque()
+        self.first: int = 0
+        self.pos: int = -1
+        self.bytes: int = 0
+        self.shape: tuple[int] = None
+        self.cur: np.ndarray = None
+
+    def record(self, arr: np.ndarray, generation: int = 0) -> None:
+        '''Appends arr after the current frame, dropping any frames ahead of it'''
+        while len(self.frames) > self.pos + 1:
+            self.bytes -= History.frameBytes(self.frames.pop())
+        packed: np.ndarray = np.packbits(arr)
+        if self.shape != arr.shape:
+            self.clear()
+            self.shape = arr.shape
+        key: bytes = zlib.compress(packed.tobytes()) if not (self.first + len(self.frames)) % self.keyEvery or not self.frames else None
+        delta: bytes = zlib.compress((packed ^ self.cur).tobytes()) if self.frames else None
+        self.frames.append((key, delta, generation))
+        self.bytes += len(key or b"") + len(delta or b"")
+        self.cur = packed
+        self.pos = len(self.frames) - 1
+        while self.bytes > self.maxBytes and self.evict(): pass
+
+    @staticmethod
+    def frameBytes(frame: tuple[bytes, bytes, int]) -> int:
+        return len(frame[0] or b"") + len(frame[1] or b"")
+
+    def evict(self) -> bool:
+        '''Drops the oldest keyframe group, False if the next keyframe is past the current frame'''
+        nxt: int = next((i for i in range(1, self.pos + 1) if self.frames[i][0] is not None), 0)
+        if not nxt: return False
+        for _ in range(nxt):
+            self.bytes -= History.frameBytes(self.frames.popleft())
+        self.first += nxt
+        self.pos -= nxt
+        return True
+
+    def unpack(self) -> np.ndarray:
+        return np.unpackbits(self.cur, count=self.shape[0]*self.shape[1]).reshape(self.shape)
+
+    def applyDelta(self, i: int) -> None:
+        self.cur = self.cur ^ np.frombuffer(zlib.decompress(self.frames[i][1]), dtype=np.uint8)
+
+    def back(self) -> np.ndarray:
+        if self.pos <= 0 or self.frames[self.pos][1] is None: return None
+        self.applyDelta(self.pos)
+        self.pos -= 1
+        return self.unpack()
+
+    def forward(self) -> np.ndarray:
+        if self.pos + 1 >= len(self.frames): return None
+        self.pos += 1
+        self.applyDelta(self.pos)
+        return self.unpack()
+
+    def seek(self, frame: int) -> np.ndarray:
+        '''Jumps to a stored frame starting from the current frame or the nearest keyframe before it'''
+        target: int = min(max(frame - self.first, 0), len(self.frames) - 1)
+        key: int = target
+        while key > 0 and self.frames[key][0] is None: key -= 1
+        if self.frames[key][0] is not None and abs(target - self.pos) > target - key:
+            self.cur = np.frombuffer(zlib.decompress(self.frames[key][0]), dtype=np.uint8)
+            self.pos = key
+        while self.pos < target: self.forward()
+        while self.pos > target: self.back()
+        return self.unpack()
+
+    def frame(self) -> int:
+        return self.first + self.pos
+
+    def generation(self) -> int:
+        return self.frames[self.pos][2]
+
+class CycleDetector:
+    '''
+    Zobrist hash of the board (XOR of a random 64-bit key per live cell), updated from the changed cells.
+    A bounded table of recent hashes finds the first repeated state, i.e. still lifes and oscillators.
+    '''
+    def __init__(self, rows: int, cols: int, maxHashes: int = 4096, seed: int = 0) -> None:
+        self.keys: np.ndarray = np.random.default_rng(seed).integers(0, 1 << 63, size=(rows, cols), dtype=np.uint64)
+        self.maxHashes: int = maxHashes
+        self.seen: OrderedDict[int: int] = OrderedDict()
+        self.hash: int = 0
+
+    def reset(self, arr: np.ndarray, generation: int = 0) -> None:
+        '''Rehashes the whole board and forgets the earlier states, for changes that are not generations'''
+        self.seen.clear()
+        self.hash = int(np.bitwise_xor.reduce(self.keys[arr.astype(bool)]))
+        self.add(generation)
+
+    def toggle(self, cells) -> None:
+        for r, c in cells:
+            self.hash ^= int(self.keys[r, c])
+
+    def diff(self, prev: np.ndarray, cur: np.ndarray) -> None:
+        self.hash ^= int(np.bitwise_xor.reduce(self.keys[prev != cur]))
+
+    def add(self, generation: int) -> tuple[int]:
+        '''Records the current hash, returns (period, generation it was last seen) if it was seen before'''
+        last: int = self.seen.pop(self.hash, None)
+        self.seen[self.hash] = generation
+        if len(self.seen) > self.maxHashes:
+            self.seen.popitem(last=False)
+        return None if last is None else (generation - last, last)
+
+class GridRenderer:
+    '''
+    Draws a cell array onto a surface with one surfarray blit and scaled blits of the changed regions,
+    the grid lines are drawn once onto a colour-keyed overlay.
+    '''
+    KEY: tuple[int] = (255, 0, 255)
+    def __init__(self, surf: pygame.Surface, rows: int, cols: int, side: int, colors: list[tuple[int]]) -> None:
+        self.surf: pygame.Surface = surf
+        self.side: int = side
+        self.cells: pygame.Surface = pygame.Surface((cols, rows))
+        self.palette: np.ndarray = np.array([self.cells.map_rgb(c) for c in colors[:2]], dtype=np.uint32)
+        self.overlay: pygame.Surface = pygame.Surface(surf.get_size())
+        self.overlay.fill(GridRenderer.KEY)
+        self.overlay.set_colorkey(GridRenderer.KEY)
+        drawGridLines(self.overlay, rows, cols, side, colors[2])
+        self.prev: np.ndarray = None
+
+    def changedRegions(self, arr: np.ndarray) -> list[tuple[int]]:
+        '''(row, col, rows, cols) of the changed cells, one box per run of consecutive changed rows'''
+        if self.prev is None or self.prev.shape != arr.shape:
+            return [(0, 0, arr.shape[0], arr.shape[1])]
+        diff: np.ndarray = arr != self.prev
+        rows: np.ndarray = np.flatnonzero(diff.any(1))
+        regions: list[tuple[int]] = []
+        for run in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+            if not len(run): continue
+            cols: np.ndarray = np.flatnonzero(diff[run[0]:run[-1]+1].any(0))
+            regions.append((run[0], cols[0], run[-1] - run[0] + 1, cols[-1] - cols[0] + 1))
+        return regions
+
+    def draw(self, arr: np.ndarray) -> list[pygame.Rect]:
+        regions: list[tuple[int]] = self.changedRegions(arr)
+        self.prev = arr
+        if not regions: return []
+        pygame.surfarray.blit_array(self.cells, self.palette[arr.T])
+        rects: list[pygame.Rect] = []
+        for r, c, h, w in regions:
+            rect: pygame.Rect = pygame.Rect(c*self.side, r*self.side, w*self.side, h*self.side)
+            self.surf.blit(pygame.transform.scale(self.cells.subsurface((c, r, w, h)), rect.size), rect)
+            self.surf.blit(self.overlay, rect, rect)
+            rects.append(rect)
+        return rects
+
 class App:
     ROWS: int = 140
     COLS: int = 200
@@ -65,13 +825,20 @@ class App:
     HEIGHT: int = ROWS * SIDE
 
     COLORS: list[tuple[int]] = [(100, 100, 100), (255, 255, 0), (150, 150, 150)]
+    RULES: dict[str: str] = {"Life": "B3/S23", "HighLife": "B36/S23", "Seeds": "B2/S", "Day & Night": "B3678/S34678"}
+    ENGINES: list[type[Life]] = [Life, LifeNumPy, HashLife, SparseLife, BitLife, ParallelLife]
     def __init__(self, WIN: pygame.Surface) -> None:
         print("Starting Cellular Automata (2D) : Conway's Game of Life")
         print("ESC to Quit")
-        print("ENTER to continue/pause the simulation")
+        print("ENTER to continue/pause the simulation (pauses by itself once the board repeats)")
         print("R to Reset")
         print("S to Save the simulation")
         print("L to Load the saved simulation")
+        print("LEFT_ARROW | RIGHT_ARROW to rewind/replay the history one generation")
+        print("PAGE_UP | PAGE_DOWN to jump a keyframe back/ahead in the history, HOME | END to its oldest/newest frame")
+        print("E to switch the simulation engine")
+        print("B to switch the rule (Life, HighLife, Seeds, Day & Night)")
+        print("UP_ARROW | DOWN_ARROW to change the HashLife step (2^n generations)")
         print("LEFT_CLICK to set the cell")
         print("RIGHT_CLICK to clear the cell")
         print("SCROLL_WHEEL_UP to increase the simulation speed")
@@ -85,25 +852,95 @@ class App:
 
         self.fps: int = 60
         self.mouseState: int = 0
-        self.life: Life = Life()
+        self.engineIdx: int = 0
+        self.ruleIdx: int = 0
+        self.life: Life = App.ENGINES[self.engineIdx]()
         self.clock = pygame.time.Clock()
+        self.renderer: GridRenderer = GridRenderer(self.SURF, App.ROWS, App.COLS, App.SIDE, App.COLORS)
+        self.history: History = History()
+        self.history.record(self.life.toArray())
+        self.cycles: CycleDetector = CycleDetector(App.ROWS, App.COLS)
+        self.resync()
+
+    def switchEngine(self) -> None:
+        self.engineIdx = (self.engineIdx + 1) % len(App.ENGINES)
+        life: Life = App.ENGINES[self.engineIdx]()
+        life.fromArray(self.life.toArray())
+        life.running = self.life.running
+        life.setRule(self.life.rule)
+        life.generation = self.life.generation
+        self.life.close()
+        self.life = life
+        pygame.display.set_caption("Conway's Game of Life")
+        print(f"Engine: {life.NAME}")
+
+    def switchRule(self) -> None:
+        self.ruleIdx = (self.ruleIdx + 1) % len(App.RULES)
+        name: str = list(App.RULES)[self.ruleIdx]
+        self.life.setRule(Rule(App.RULES[name]))
+        self.resync()
+        print(f"Rule: {name} ({self.life.rule})")
+
+    def resync(self) -> None:
+        '''Rehashes the board after a change that is not a generation step (edits, loads, rewinds)'''
+        self.arr: np.ndarray = self.life.toArray()
+        self.cycles.reset(self.arr, self.life.generation)
+        # The reported (period, start) of the cycle the board is in, it stays in it until the next resync
+        self.cycle: tuple[int] = None
+
+    def step(self) -> None:
+        self.life.next()
+        arr: np.ndarray = self.life.toArray()
+        if isinstance(self.life, SparseLife):
+            self.cycles.toggle(self.life.changed)
+        else:
+            self.cycles.diff(self.arr, arr)
+        self.arr = arr
+        self.history.record(arr, self.life.generation)
+
+        if self.cycle is not None: return
+        cycle: tuple[int] = self.cycles.add(self.life.generation)
+        if cycle is not None:
+            self.cycle = cycle
+            self.life.running = False
+            kind: str = "Still life" if cycle[0] == 1 else f"Cycle of period {cycle[0]}"
+            print(f"{kind} since generation {cycle[1]}, paused at generation {self.life.generation}")
+            pygame.display.set_caption(f"Conway's Game of Life ({kind.lower()} since generation {cycle[1]})")
+
+    def rewind(self, d: int) -> None:
+        self.life.running = False
+        arr: np.ndarray = self.history.back() if d < 0 else self.history.forward()
+        if arr is not None:
+            self.life.fromArray(arr)
+            self.life.generation = self.history.generation()
+            self.resync()
+        elif d > 0:
+            self.step()
+        print(f"Generation {self.life.generation}")
+
+    def seek(self, frame: int) -> None:
+        self.life.running = False
+        if not self.history.frames: return
+        self.life.fromArray(self.history.seek(frame))
+        self.life.generation = self.history.generation()
+        self.resync()
+        print(f"Generation {self.life.generation}")
 
-    def drawGrid(self) -> None:
-        for i, row in enumerate(self.life.grid):
-            for j, col in enumerate(row):
-                if col:
-                    pygame.draw.rect(self.SURF, App.COLORS[1], (j*App.SIDE, i*App.SIDE, App.SIDE, App.SIDE))
+    def changeStep(self, d: int) -> None:
+        if not isinstance(self.life, HashLife): return
+        self.life.stepLog = max(self.life.stepLog + d, 0)
+        print(f"Step: 2^{self.life.stepLog} generations (generation {self.life.generation})")
 
     def draw(self) -> None:
-        self.SURF.fill(App.COLORS[0])
-        self.drawGrid()
-        drawGridLines(self.SURF, App.ROWS, App.COLS, App.SIDE, App.COLORS[2])
-        self.update()
+        rects: list[pygame.Rect] = self.renderer.draw(self.life.toArray())
+        if rects:
+            pygame.display.update([self.WIN.blit(self.SURF, r.move(self.blitPos), r) for r in rects])
     
     def update(self) -> None:
         pygame.display.update(self.WIN.blit(self.SURF, self.blitPos))
     
     def quit(self) -> None:
+        self.life.close()
         pygame.display.set_caption("Visualizations")
     
     def getMousePos(self) -> tuple[int]:
@@ -115,7 +952,9 @@ class App:
             self.clock.tick(self.fps)
             for event in pygame.event.get():
                 match event.type:
-                    case pygame.QUIT: return False
+                    case pygame.QUIT:
+                        self.life.close()
+                        return False
                     
                     case pygame.KEYDOWN:
                         match event.key:
@@ -127,10 +966,36 @@ class App:
                                 self.fps = 10 if self.life.running else 30
                             case pygame.K_r:
                                 self.life.resetGrid()
+                                self.life.generation = 0
+                                self.history.clear()
+                                self.history.record(self.life.toArray())
+                                self.resync()
                             case pygame.K_s:
                                 self.life.save()
                             case pygame.K_l:
                                 self.life.load()
+                                self.history.record(self.life.toArray(), self.life.generation)
+                                self.resync()
+                            case pygame.K_LEFT:
+                                self.rewind(-1)
+                            case pygame.K_RIGHT:
+                                self.rewind(1)
+                            case pygame.K_PAGEUP:
+                                self.seek(self.history.frame() - self.history.keyEvery)
+                            case pygame.K_PAGEDOWN:
+                                self.seek(self.history.frame() + self.history.keyEvery)
+                            case pygame.K_HOME:
+                                self.seek(self.history.first)
+                            case pygame.K_END:
+                                self.seek(self.history.first + len(self.history.frames) - 1)
+                            case pygame.K_e:
+                                self.switchEngine()
+                            case pygame.K_b:
+                                self.switchRule()
+                            case pygame.K_UP:
+                                self.changeStep(1)
+                            case pygame.K_DOWN:
+                                self.changeStep(-1)
                     
                     case pygame.MOUSEBUTTONDOWN:
                         match event.button:
@@ -147,14 +1012,21 @@ class App:
                         self.mouseState = 0
             
             if self.life.running:
-                self.life.next()
+                self.step()
+                if isinstance(self.life, SparseLife) and self.life.running:
+                    pygame.display.set_caption(f"Conway's Game of Life ({self.life.active}/{self.life.rows*self.life.cols} cells active)")
             if self.mouseState:
                 self.life.place(self.getMousePos(), self.mouseState - 1)
+                self.resync()
 
             self.draw()
 
 if __name__ == "__main__":
-    WIN: pygame.Surface = pygame.display.set_mode((App.WIDTH, App.HEIGHT))
-    app: App = App(WIN)
-    app.mainloop()
-    pygame.quit()
\ No newline at end of file
+    import sys
+    if "--bench-parallel" in sys.argv:
+        benchmarkParallel(*map(int, sys.argv[sys.argv.index("--bench-parallel")+1:]))
+    else:
+        WIN: pygame.Surface = pygame.display.set_mode((App.WIDTH, App.HEIGHT))
+        app: App = App(WIN)
+        app.mainloop()
+        pygame.quit()
\ No newline at end of file
@@ -0,0 +1,112 @@
+'''
+Headless benchmark runner for the Game of Life engines
+'''
+import argparse, re, time, tracemalloc, zlib
+import numpy as np
+from life import App, Life, Rule
+
+def loadRLE(text: str) -> np.ndarray:
+    lines: list[str] = [l.strip() for l in text.splitlines() if l.strip() and not l.startswith("#")]
+    header: dict[str: str] = dict(re.findall(r"(\w+)\s*=\s*([^,]+)", lines[0]))
+    cols, rows = int(header["x"]), int(header["y"])
+    pattern: np.ndarray = np.zeros((rows, cols), dtype=np.uint8)
+    r: int = 0
+    c: int = 0
+    for count, tag in re.findall(r"(\d*)([a-zA-Z$!])", "".join(lines[1:])):
+        n: int = int(count) if count else 1
+        match tag:
+            case "!": break
+            case "$":
+                r += n
+                c = 0
+            case "b" | ".":
+                c += n
+            case _:
+                pattern[r, c:c+n] = 1
+                c += n
+    return pattern
+
+def loadPlaintext(text: str) -> np.ndarray:
+    lines: list[str] = [l.rstrip() for l in text.splitlines() if not l.startswith("!")]
+    pattern: np.ndarray = np.zeros((len(lines), max(len(l) for l in lines)), dtype=np.uint8)
+    for r, line in enumerate(lines):
+        for c, ch in enumerate(line):
+            if ch in "O*": pattern[r, c] = 1
+    return pattern
+
+def loadPattern(path: str) -> np.ndarray:
+    with open(path) as f:
+        text: str = f.read()
+    return loadRLE(text) if path.lower().endswith(".rle") else loadPlaintext(text)
+
+def makeBoard(pattern: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    '''Centres the pattern on an empty rows x cols board'''
+    if pattern.shape[0] > rows or pattern.shape[1] > cols:
+        raise ValueError(f"Pattern of size {pattern.shape} does not fit on a {rows}x{cols} board")
+    board: np.ndarray = np.zeros((rows, cols), dtype=np.uint8)
+    r, c = (rows - pattern.shape[0])//2, (cols - pattern.shape[1])//2
+    board[r:r+pattern.shape[0], c:c+pattern.shape[1]] = pattern
+    return board
+
+def checksum(arr: np.ndarray) -> int:
+    return zlib.crc32(np.packbits(arr).tobytes())
+
+def runEngine(engine: type[Life], board: np.ndarray, gens: int, rule: Rule, memory: bool = True) -> dict:
+    life: Life = engine(*board.shape)
+    life.fromArray(board)
+    life.setRule(rule)
+    life.run(0) # Lets engines with worker processes finish starting them
+    start: float = time.perf_counter()
+    life.run(gens)
+    elapsed: float = time.perf_counter() - start
+    arr: np.ndarray = life.toArray()
+    life.close()
+
+    peak: int = 0
+    if memory:
+        # Separate traced run, tracemalloc would skew the timing
+        tracemalloc.start()
+        life = engine(*board.shape)
+        life.fromArray(board)
+        life.setRule(rule)
+        life.run(gens)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        life.close()
+
+    return {"engine": engine.NAME + ("" if engine.TORUS else "*"), "gens/s": gens / elapsed if elapsed else float("inf"), "seconds": elapsed,
+            "peak": peak, "population": int(arr.sum()), "checksum": checksum(arr)}
+
+def main() -> None:
+    engines: dict[str: type[Life]] = {e.NAME.lower(): e for e in App.ENGINES}
+    parser = argparse.ArgumentParser(description="Runs Game of Life engines without a window")
+    parser.add_argument("pattern", nargs="?", help=".rle or plaintext (.cells) pattern, a random board if omitted")
+    parser.add_argument("-e", "--engine", action="append", choices=[*engines, "all"], help="engine to run (repeatable, default numpy)")
+    parser.add_argument("-g", "--gens", type=int, default=100)
+    parser.add_argument("-r", "--rows", type=int, default=App.ROWS)
+    parser.add_argument("-c", "--cols", type=int, default=App.COLS)
+    parser.add_argument("--rule", default="B3/S23", help="outer-totalistic rule, e.g. B36/S23")
+    parser.add_argument("--density", type=float, default=0.2, help="live cell density of the random board")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run for peak memory")
+    args = parser.parse_args()
+
+    if args.pattern:
+        board: np.ndarray = makeBoard(loadPattern(args.pattern), args.rows, args.cols)
+    else:
+        board = (np.random.default_rng(args.seed).random((args.rows, args.cols)) < args.density).astype(np.uint8)
+    rule: Rule = Rule(args.rule)
+    chosen: list[str] = args.engine or ["numpy"]
+    if "all" in chosen: chosen = list(engines)
+
+    print(f"{args.rows}x{args.cols} board, population {int(board.sum())}, {args.gens} generations of {rule}")
+    print(f"{'engine':<10} {'gens/s':>12} {'seconds':>9} {'peak MiB':>9} {'population':>11} {'checksum':>10}")
+    for name in chosen:
+        res: dict = runEngine(engines[name], board, args.gens, rule, not args.no_memory)
+        peak: str = f"{res['peak'] / (1 << 20):.1f}" if not args.no_memory else "-"
+        print(f"{res['engine']:<10} {res['gens/s']:>12.1f} {res['seconds']:>9.3f} {peak:>9} {res['population']:>11} {res['checksum']:>10x}")
+    if any(not engines[name].TORUS for name in chosen):
+        print("* unbounded plane instead of a torus, population and checksum are not comparable once cells reach the edges")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+'''
+Headless batch runner for the A* pathfinder, reads Moving AI .map/.scen benchmark files
+'''
+import argparse, os, random, time
+from multiprocessing import Pool, shared_memory
+from astar import Astar
+
+PASSABLE: str = ".GS"
+searcher: Astar = None
+
+def loadMap(path: str) -> tuple[int, int, bytearray]:
+    '''Returns (rows, cols, grid) with 1 for passable and 0 for blocked cells'''
+    with open(path) as f:
+        lines: list[str] = f.read().splitlines()
+    header: dict[str: str] = {}
+    for n, line in enumerate(lines):
+        if line.strip() == "map": break
+        key, _, value = line.partition(" ")
+        header[key] = value.strip()
+    rows, cols = int(header["height"]), int(header["width"])
+    grid: bytearray = bytearray(rows * cols)
+    for r, line in enumerate(lines[n+1:n+1+rows]):
+        for c, ch in enumerate(line[:cols]):
+            grid[r*cols + c] = ch in PASSABLE
+    return rows, cols, grid
+
+def loadScen(path: str) -> list[tuple[list[int]]]:
+    '''(start, goal) pairs as [row, col] from a .scen file'''
+    queries: list[tuple[list[int]]] = []
+    with open(path) as f:
+        for line in f:
+            fields: list[str] = line.split()
+            if len(fields) < 9 or fields[0] == "version": continue
+            sx, sy, gx, gy = map(int, fields[4:8])
+            queries.append(([sy, sx], [gy, gx]))
+    return queries
+
+def randomQueries(rows: int, cols: int, grid: bytearray, n: int, seed: int = 0) -> list[tuple[list[int]]]:
+    rng: random.Random = random.Random(seed)
+    free: list[int] = [i for i, v in enumerate(grid) if v]
+    return [(list(divmod(rng.choice(free), cols)), list(divmod(rng.choice(free), cols))) for _ in range(n)]
+
+def initWorker(name: str, rows: int, cols: int, options: dict) -> None:
+    '''Attaches a pool process to the shared grid, the Astar only ever reads it'''
+    global searcher
+    mem: shared_memory.SharedMemory = shared_memory.SharedMemory(name=name)
+    searcher = Astar(rows, cols, **options)
+    searcher.grid = mem.buf
+    searcher.mem = mem
+
+def solveChunk(queries: list[tuple[list[int]]]) -> list[tuple[int, int, float]]:
+    '''(path length, expanded nodes, seconds) for every query, a path length of 0 means unreachable'''
+    results: list[tuple[int, int, float]] = []
+    for start, goal in queries:
+        t: float = time.perf_counter()
+        path: list[tuple[int]] = searcher.solve(start, goal)
+        results.append((len(path), searcher.expanded, time.perf_counter() - t))
+    return results
+
+def solveBatch(rows: int, cols: int, grid: bytearray, queries: list[tuple[list[int]]], workers: int = 0,
+               chunk: int = 16, **options) -> list[tuple[int, int, float]]:
+    '''
+    Solves every query across a process pool sharing one copy of the grid, results keep the query order.
+    options are passed on to Astar (mode, tieBreak, diagonal)
+    '''
+    mem: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=len(grid))
+    try:
+        mem.buf[:len(grid)] = grid
+        if workers == 1:
+            initWorker(mem.name, rows, cols, options)
+            results: list[tuple[int, int, float]] = solveChunk(queries)
+            searcher.grid = None
+            searcher.mem.close()
+            return results
+        chunks: list[list[tuple[list[int]]]] = [queries[i:i+chunk] for i in range(0, len(queries), chunk)]
+        with Pool(workers or os.cpu_count(), initWorker, (mem.name, rows, cols, options)) as pool:
+            return [res for part in pool.imap(solveChunk, chunks) for res in part]
+    finally:
+        mem.close()
+        mem.unlink()
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs batches of A* queries without a window")
+    parser.add_argument("map", nargs="?", help="Moving AI .map file, a random grid if omitted")
+    parser.add_argument("-s", "--scen", help="Moving AI .scen file with the queries, random queries if omitted")
+    parser.add_argument("-n", "--queries", type=int, default=1000, help="number of random queries, or the first n of the .scen")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="pool processes (default one per CPU, 1 runs in this process)")
+    parser.add_argument("-m", "--mode", choices=Astar.MODES, default="A*")
+    parser.add_argument("-t", "--tie", choices=Astar.TIEBREAKS, default="FIFO", help="tie-breaking between cells of equal f")
+    parser.add_argument("-d", "--diagonal", action="store_true", help="8-connected moves with the octile heuristic (A* only)")
+    parser.add_argument("-r", "--rows", type=int, default=256, help="rows of the random grid")
+    parser.add_argument("-c", "--cols", type=int, default=256, help="columns of the random grid")
+    parser.add_argument("--density", type=float, default=0.25, help="wall density of the random grid")
+    parser.add_argument("--chunk", type=int, default=16, help="queries sent to a worker at a time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.map:
+        rows, cols, grid = loadMap(args.map)
+    else:
+        rows, cols = args.rows, args.cols
+        rng: random.Random = random.Random(args.seed)
+        grid = bytearray(rng.random() >= args.density for _ in range(rows * cols))
+    queries: list[tuple[list[int]]] = loadScen(args.scen)[:args.queries] if args.scen else randomQueries(rows, cols, grid, args.queries, args.seed)
+
+    workers: int = args.workers or os.cpu_count()
+    t: float = time.perf_counter()
+    results: list[tuple[int, int, float]] = solveBatch(rows, cols, grid, queries, workers, args.chunk,
+                                                           mode=args.mode, tieBreak=args.tie, diagonal=args.diagonal)
+    elapsed: float = time.perf_counter() - t
+    if not results:
+        print("No queries to run")
+        return
+
+    latencies: list[float] = sorted(res[2] * 1000 for res in results)
+    expanded: list[int] = [res[1] for res in results]
+    moves: str = "8-connected" if args.diagonal else "4-connected"
+    print(f"{rows}x{cols} grid, {len(results)} {args.mode} {moves} queries with {args.tie} ties on {workers} workers, {sum(res[0] > 0 for res in results)} paths found")
+    print(f"Throughput: {len(results) / elapsed:.1f} queries/s ({elapsed:.2f} s)")
+    print(f"Latency ms: p50 {percentile(latencies, 50):.2f}  p90 {percentile(latencies, 90):.2f}  "
+          f"p99 {percentile(latencies, 99):.2f}  max {latencies[-1]:.2f}")
+    print(f"Expanded nodes: mean {sum(expanded) / len(expanded):.0f}  max {max(expanded)}  total {sum(expanded)}")
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@
 Cellular Automata: Sand Simulation
 '''
 import pygame, random
+import numpy as np
 from utils import HSVToRGB
 
 class Sand:
     COLOR: tuple[int] = (0, 0, 0)
+    # Grid values are 0 for empty and hue+1 for a grain, so grains keep the colour they were placed with
+    PALETTE: list[tuple[int]] = [HSVToRGB(h, 1, 1) for h in range(360)]
+    CHUNK: int = 8
     def __init__(self):
         self.reset()
         self.rad = 1
@@ -13,25 +17,75 @@ class Sand:
     def reset(self):
         App.instance.SURF.fill(self.COLOR)
         self.resetGrid()
+        self.dirty: set[tuple[int]] = set()
         self.h: int = 0
         self.running: bool = True
         App.instance.update()
 
     def resetGrid(self):
         self.grid: list[list[int]] = [[0 for i in range(App.COLS)] for j in range(App.ROWS)]
+        # Chunks updated in the last step, and the ones to update in the next step
+        self.awake: set[tuple[int]] = set()
+        self.awakeNext: set[tuple[int]] = set()
+
+    def wake(self, r: int, c: int) -> None:
+        '''Wakes the chunk holding (r, c) and its neighbouring chunks for the next step'''
+        cr, cc = r // Sand.CHUNK, c // Sand.CHUNK
+        for i in range(max(cr-1, 0), min(cr+2, (App.ROWS-1)//Sand.CHUNK + 1)):
+            for j in range(max(cc-1, 0), min(cc+2, (App.COLS-1)//Sand.CHUNK + 1)):
+                self.awakeNext.add((i, j))
     
+    def toArray(self) -> np.ndarray:
+        return np.array(self.grid, dtype=np.uint16)
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        App.instance.SURF.fill(self.COLOR)
+        self.grid = arr.astype(np.uint16).tolist()
+        self.dirty.update((r, c) for r in range(App.ROWS) for c in range(App.COLS))
+        for r in range(0, App.ROWS, Sand.CHUNK):
+            for c in range(0, App.COLS, Sand.CHUNK):
+                self.wake(r, c)
+        self.flush()
+
     def swap(self, r1, c1, r2, c2):
         self.grid[r1][c1], self.grid[r2][c2] = self.grid[r2][c2], self.grid[r1][c1]
-        pygame.draw.rect(App.instance.SURF, self.COLOR, (c1*App.SIDE, r1*App.SIDE, App.SIDE, App.SIDE))
-        pygame.draw.rect(App.instance.SURF, self.getColor(), (c2*App.SIDE, r2*App.SIDE, App.SIDE, App.SIDE))
-        App.instance.update()
+        self.dirty.add((r1, c1))
+        self.dirty.add((r2, c2))
+        self.wake(r1, c1)
+        self.wake(r2, c2)
+
+    def flush(self):
+        '''Redraws the dirty cells and pushes them to the window as merged rectangles in one batch'''
+        if not self.dirty: return
+        spans: dict[int: list[int]] = {}
+        for r, c in self.dirty:
+            val: int = self.grid[r][c]
+            pygame.draw.rect(App.instance.SURF, Sand.PALETTE[val-1] if val else self.COLOR, (c*App.SIDE, r*App.SIDE, App.SIDE, App.SIDE))
+            span: list[int] = spans.setdefault(r, [c, c])
+            span[0], span[1] = min(span[0], c), max(span[1], c)
+        self.dirty.clear()
+
+        # One rect per run of consecutive rows whose column spans overlap
+        rects: list[pygame.Rect] = []
+        last: int = -2
+        for r in sorted(spans):
+            c1, c2 = spans[r]
+            rect: pygame.Rect = pygame.Rect(c1*App.SIDE, r*App.SIDE, (c2-c1+1)*App.SIDE, App.SIDE)
+            if r == last + 1 and rects[-1].left <= rect.right and rect.left <= rects[-1].right:
+                rects[-1].union_ip(rect)
+            else:
+                rects.append(rect)
+            last = r
+        App.instance.updateRects(rects)
 
-    def getColor(self) -> list[int]:
-        return HSVToRGB(self.h, 1, 1)
-    
     def next(self):
+        # Only the columns of awake chunks are scanned, settled piles cost nothing
+        self.awake, self.awakeNext = self.awakeNext, set()
+        chunkCols: dict[int: list[range]] = {}
+        for cr, cc in sorted(self.awake):
+            chunkCols.setdefault(cr, []).append(range(cc*Sand.CHUNK, min((cc+1)*Sand.CHUNK, App.COLS)))
         for i in range(App.ROWS-2, -1, -1):
-            for j in range(App.COLS):
+            for j in (j for cols in chunkCols.get(i // Sand.CHUNK, ()) for j in cols):
                 if not self.grid[i][j]: continue
                 dir = random.choice([1, -1])
                 if not self.grid[i+1][j]:
@@ -41,6 +95,7 @@ class Sand:
                 elif j-dir >= 0 and j-dir < App.COLS and not self.grid[i][j-dir] and not self.grid[i+1][j-dir]:
                     self.swap(i, j, i+1, j-dir)
         
+        self.flush()
         self.h = (self.h + 1) % 360
     
     def place(self, pos, state):
@@ -49,14 +104,101 @@ class Sand:
             for i in range(max(row-self.rad, 0), min(row+self.rad+1, App.ROWS)):
                 for j in range(max(col-self.rad, 0), min(col+self.rad+1, App.COLS)):
                     if not self.grid[i][j]:
-                        self.grid[i][j] = 1
-                        pygame.draw.rect(App.instance.SURF, self.getColor(), (j*App.SIDE, i*App.SIDE, App.SIDE, App.SIDE))
+                        self.grid[i][j] = self.h + 1
+                        self.dirty.add((i, j))
+                        self.wake(i, j)
         else:
             if self.grid[row][col]:
                 self.grid[row][col] = 0
-                pygame.draw.rect(App.instance.SURF, self.COLOR, (col*App.SIDE, row*App.SIDE, App.SIDE, App.SIDE))
+                self.dirty.add((row, col))
+                self.wake(row, col)
+        self.flush()
+
+class SandNumPy:
+    '''
+    Array-backed sand. Even and odd source rows move in two phases, so every grain moves at most once
+    per step and no two grains compete for the same cell. Left/right bias comes from a pool of
+    pre-generated random arrays.
+    '''
+    COLOR: tuple[int] = Sand.COLOR
+    POOL: int = 8
+    def __init__(self, rows: int = 0, cols: int = 0):
+        self.rows: int = rows or App.ROWS
+        self.cols: int = cols or App.COLS
+        self.bias: np.ndarray = np.random.default_rng().random((SandNumPy.POOL, self.rows, self.cols)) < 0.5
+        self.tick: int = 0
+        self.cells: pygame.Surface = pygame.Surface((self.cols, self.rows))
+        self.palette: np.ndarray = np.array([self.cells.map_rgb(c) for c in [self.COLOR] + Sand.PALETTE], dtype=np.uint32)
+        self.reset()
+        self.rad = 1
+
+    def reset(self):
+        self.resetGrid()
+        self.h: int = 0
+        self.running: bool = True
+        self.draw()
+
+    def resetGrid(self):
+        self.grid: np.ndarray = np.zeros((self.rows, self.cols), dtype=np.uint16)
+
+    def fall(self, src: np.ndarray, dst: np.ndarray, free: np.ndarray, moved: np.ndarray, right: np.ndarray) -> None:
+        '''Moves the free grains of the src rows into the dst rows below them, updating the moved mask of dst'''
+        down: np.ndarray = free & (dst == 0)
+        dst[down] = src[down]
+        src[down] = 0
+        moved[down] = True
+        free &= ~down
+        # Preferred side first, then the other one, each direction in its own pass so targets never collide
+        for pref, d in ((right, 1), (~right, -1), (right, -1), (~right, 1)):
+            if d == 1:
+                go: np.ndarray = free[:, :-1] & pref[:, :-1] & (src[:, 1:] == 0) & (dst[:, 1:] == 0)
+                dst[:, 1:][go] = src[:, :-1][go]
+                src[:, :-1][go] = 0
+                moved[:, 1:] |= go
+                free[:, :-1] &= ~go
+            else:
+                go = free[:, 1:] & pref[:, 1:] & (src[:, :-1] == 0) & (dst[:, :-1] == 0)
+                dst[:, :-1][go] = src[:, 1:][go]
+                src[:, 1:][go] = 0
+                moved[:, :-1] |= go
+                free[:, 1:] &= ~go
+
+    def next(self):
+        prev: np.ndarray = self.grid.copy()
+        moved: np.ndarray = np.zeros(self.grid.shape, dtype=bool)
+        right: np.ndarray = self.bias[self.tick % SandNumPy.POOL]
+        self.tick += 1
+        for parity in (1, 0) if self.rows % 2 else (0, 1):
+            src: np.ndarray = self.grid[parity:-1:2]
+            free: np.ndarray = (src != 0) & ~moved[parity:-1:2]
+            self.fall(src, self.grid[parity+1::2], free, moved[parity+1::2], right[parity:-1:2])
+        if not np.array_equal(self.grid, prev): self.draw()
+        self.h = (self.h + 1) % 360
+
+    def place(self, pos, state):
+        row, col = pos[1]//App.SIDE, pos[0]//App.SIDE
+        if not (0 <= row < self.rows and 0 <= col < self.cols): return
+        if state:
+            region: np.ndarray = self.grid[max(row-self.rad, 0):row+self.rad+1, max(col-self.rad, 0):col+self.rad+1]
+            if region.all(): return
+            region[region == 0] = self.h + 1
+        else:
+            if not self.grid[row, col]: return
+            self.grid[row, col] = 0
+        self.draw()
+
+    def draw(self) -> None:
+        pygame.surfarray.blit_array(self.cells, self.palette[self.grid.T])
+        pygame.transform.scale(self.cells, App.instance.SURF.get_size(), App.instance.SURF)
         App.instance.update()
 
+    def toArray(self) -> np.ndarray:
+        return self.grid.copy()
+
+    def fromArray(self, arr: np.ndarray) -> None:
+        self.grid = arr.astype(np.uint16)
+        self.draw()
+
 class App:
     ROWS: int = 72
     COLS: int = 100
@@ -64,11 +206,14 @@ class App:
     WIDTH: int = COLS * SIDE
     HEIGHT: int = ROWS * SIDE
     instance = None
+    ENGINES: list[type] = [Sand, SandNumPy]
     def __init__(self, WIN: pygame.Surface) -> None:
         print("Starting the Cellular Automata: Sand simulation")
         print("ESC to Quit")
         print("R to reset the simulation")
         print("P to pause/continue")
+        print("E to switch the simulation engine")
+        print("D to show/hide the awake chunks")
         print("LEFT_CLICK to place sand")
         print("RIGHT_CLICK to delete sand")
 
@@ -81,10 +226,31 @@ class App:
         self.blitPos: tuple[int] = ((WINRect.width - App.WIDTH)//2, (WINRect.height - App.HEIGHT)//2)
 
         self.mouseState: int = 0
-        self.sand: Sand = Sand()
+        self.engineIdx: int = 0
+        self.showChunks: bool = False
+        self.sand: Sand | SandNumPy = App.ENGINES[self.engineIdx]()
+
+    def switchEngine(self) -> None:
+        self.engineIdx = (self.engineIdx + 1) % len(App.ENGINES)
+        sand: Sand | SandNumPy = App.ENGINES[self.engineIdx]()
+        sand.fromArray(self.sand.toArray())
+        sand.running = self.sand.running
+        self.sand = sand
+        print(f"Engine: {type(sand).__name__}")
     
     def update(self) -> None:
         pygame.display.update(self.WIN.blit(self.SURF, self.blitPos))
+
+    def drawChunks(self) -> None:
+        '''Debug overlay: outlines the chunks updated in the last step on top of the window'''
+        rect: pygame.Rect = self.WIN.blit(self.SURF, self.blitPos)
+        size: int = Sand.CHUNK * App.SIDE
+        for cr, cc in self.sand.awake:
+            pygame.draw.rect(self.WIN, (0, 255, 0), (self.blitPos[0] + cc*size, self.blitPos[1] + cr*size, size, size), 1)
+        pygame.display.update(rect)
+
+    def updateRects(self, rects: list[pygame.Rect]) -> None:
+        pygame.display.update(self.WIN.blits([(self.SURF, r.move(self.blitPos), r) for r in rects]))
     
     def quit(self) -> None:
         pygame.display.set_caption("Visualizations")
@@ -108,6 +274,11 @@ class App:
                                 self.sand.reset()
                             case pygame.K_p:
                                 self.sand.running = not self.sand.running
+                            case pygame.K_e:
+                                self.switchEngine()
+                            case pygame.K_d:
+                                self.showChunks = not self.showChunks
+                                if not self.showChunks: self.update()
                     
                     case pygame.MOUSEBUTTONDOWN:
                         match event.button:
@@ -123,6 +294,8 @@ class App:
                 self.sand.place(self.getMousePos(), self.mouseState-1)
             if self.sand.running:
                 self.sand.next()
+            if self.showChunks and isinstance(self.sand, Sand):
+                self.drawChunks()
 
 if __name__ == "__main__":
     WIN: pygame.Surface = pygame.display.set_mode((App.WIDTH, App.HEIGHT))